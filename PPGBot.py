@@ -16,7 +16,12 @@ from discord.ext import commands
 
 from pyhtml import server
 import cogs
-from cogs.utils import db, data
+from cogs.utils import db, data, backends, snapshot, translation
+from cogs.utils.bus import Bus
+from cogs.utils.deleter import MessageDeleter
+from cogs.utils.experience import ExpAccumulator, exp_needed
+from cogs.utils.scheduler import Scheduler
+from cogs.utils.waiters import Waiters
 from cogs.utils.translation import _
 
 try:
@@ -33,12 +38,17 @@ elif os.getcwd().endswith("rpgtest"):
 
 
 class Bot(commands.AutoShardedBot):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, shard_count=5, game=discord.Game(name="rp!help for help!"), **kwargs)
+    def __init__(self, *args, worker=0, **kwargs):
+        # When run by `cluster.py`, each worker process is given its own shard_ids out of shard_count
+        kwargs.setdefault("shard_count", 5)
+        super().__init__(*args, game=discord.Game(name="rp!help for help!"), **kwargs)
         self.owner_id = 477463812786618388
         self.lounge_id = 530023045918883840
         self.uptime = datetime.datetime.utcnow()
-        self.commands_used = Counter()
+        self.worker = worker
+        self.commands_used = Counter()  # Across the whole cluster
+        self.commands_delta = Counter()  # Used here since the last stats were published
+        self.cluster_guilds = dict()  # Other workers' guild counts
         self.server_commands = Counter()
         self.socket_stats = Counter()
         self.shutdowns = []
@@ -69,8 +79,21 @@ class Bot(commands.AutoShardedBot):
         self.httpserver = server.API(self, "RPGBot")
         server.makepaths(self.httpserver)
 
-        self.db: db.Database = db.Database(self)
+        storage = backends.MemoryStorage() if "memory" in sys.argv else backends.PostgresStorage()
+        # Buffered writes skip the versioned retries and can lose up to max_staleness seconds of writes on a crash,
+        # so they're only used when asked for
+        write_behind = dict(interval=0.5, max_size=500, max_staleness=5.0) if "writebehind" in sys.argv else None
+        self.db: db.Database = db.Database(self, storage, write_behind=write_behind)
         self.di: data.DataInteraction = data.DataInteraction(self)
+        self.exp = ExpAccumulator(self)
+        self.waiters = Waiters(self)
+        self.scheduler = Scheduler(self, worker)
+        self.deleter = MessageDeleter(self)
+        self.bus = Bus(self, worker)
+        self.db.bus = self.bus
+        self.bus.subscribe("invalidate", self.db.invalidated)
+        self.bus.subscribe("missed", self.db.invalidate_all)
+        self.bus.subscribe("stats", self.stats_received)
         self.default_udata = data.default_user
         self.default_servdata = data.default_server
         self.rnd = "1234567890abcdefghijklmnopqrstuvwxyz"
@@ -79,7 +102,7 @@ class Bot(commands.AutoShardedBot):
             self.patrons = {int(k): v for k, v in json.loads(pj.read()).items()}
 
         with open("resources/newtranslations.json") as trf:
-            self.translations = json.loads(trf.read())
+            self.translations = translation.Translations(self, json.loads(trf.read()))
         self.languages = ["en", "fr", "de", "ru", "es"]
 
         with open("resources/blacklist.json") as blf:
@@ -103,7 +126,7 @@ class Bot(commands.AutoShardedBot):
             self.add_cog(cog)
 
         # self.loop.create_task(self.start_serv())
-        self.loop.create_task(self.httpserver.host())
+        self.loop.create_task(self.start_services())
 
         init_dd(self._auth[3], self._auth[4])
         self.stats = ThreadStats()
@@ -114,24 +137,64 @@ class Bot(commands.AutoShardedBot):
         print(self.user.name)
         print(self.user.id)
         print('------')
-        self.loop.create_task(self.update_stats())
+        if self.worker == 0:
+            self.loop.create_task(self.update_stats())
+
+    async def start_services(self):
+        await self.db.connect()
+        await self.bus.start()
+        await self.scheduler.start()
+        self.exp.start()
+        self.loop.create_task(self.publish_stats())
+        if self.worker == 0:
+            # Only one web server can listen on the port
+            await self.httpserver.host()
+
+    async def publish_stats(self):
+        while True:
+            self.bus.publish("stats", worker=self.worker, guilds=len(self.guilds), commands=dict(self.commands_delta))
+            self.commands_delta.clear()
+            self.stats.gauge("RPGBot.scheduler.pending", self.scheduler.pending, tags=["RPGBot:scheduler"],
+                             host="scw-8112e8")
+            await asyncio.sleep(60)
+
+    def stats_received(self, event):
+        self.cluster_guilds[event["worker"]] = event["guilds"]
+        self.commands_used.update(event["commands"])
+
+    def guild_count(self):
+        """Count the guilds of every worker in the cluster"""
+        return len(self.guilds) + sum(self.cluster_guilds.values())
 
     async def on_message(self, msg):
+        self.waiters.message_sent(msg)
         if msg.author.id not in self.blacklist:
             ctx = await self.get_context(msg)
             await self.invoke(ctx)
 
+    async def on_reaction_add(self, reaction, user):
+        self.waiters.reaction_added(reaction, user)
+
+    async def invoke(self, ctx):
+        # Every read of the same record during the command is served from one snapshot, see `cogs.utils.snapshot`
+        ctx.snapshot = snapshot.Snapshot()
+        snapshot.bind(ctx.snapshot)
+        try:
+            await super().invoke(ctx)
+        finally:
+            snapshot.unbind()
+
     async def update_stats(self):
         url = "https://bots.discord.pw/api/bots/{}/stats".format(self.user.id)
         while not self.is_closed():
-            payload = json.dumps(dict(server_count=len(self.guilds))).encode()
+            payload = json.dumps(dict(server_count=self.guild_count())).encode()
             headers = {'authorization': self._auth[1], "Content-Type": "application/json"}
 
             async with self.session.post(url, data=payload, headers=headers) as response:
                 await response.read()
 
             url = "https://discordbots.org/api/bots/{}/stats".format(self.user.id)
-            payload = json.dumps(dict(server_count=len(self.guilds))).encode()
+            payload = json.dumps(dict(server_count=self.guild_count())).encode()
             headers = {'authorization': self._auth[2], "Content-Type": "application/json"}
 
             async with self.session.post(url, data=payload, headers=headers) as response:
@@ -140,10 +203,13 @@ class Bot(commands.AutoShardedBot):
             await asyncio.sleep(14400)
 
     async def on_command(self, ctx):
+        # Events run in their own task, share the command's snapshot
+        snapshot.bind(ctx.snapshot)
         self.stats.increment("RPGBot.commands", tags=["RPGBot:commands"], host="scw-8112e8")
         self.stats.increment(f"RPGBot.commands.{str(ctx.command).replace(' ', '.')}", tags=["RPGBot:commands"],
                              host="scw-8112e8")
-        self.commands_used[ctx.command] += 1
+        self.commands_used[str(ctx.command)] += 1
+        self.commands_delta[str(ctx.command)] += 1
         if isinstance(ctx.author, discord.Member):
             self.server_commands[ctx.guild.id] += 1
             if ctx.guild.id not in self.patrons:
@@ -170,14 +236,10 @@ class Bot(commands.AutoShardedBot):
                     add += values.get(fpn, 0)
 
                 if add:
-                    await asyncio.sleep(4)
-                    r = await self.di.add_exp(ctx.author, add)
-                    if r is not None:
-                        await ctx.message.add_reaction("\u23EB")
+                    self.exp.add(ctx.author, add, ctx.message)
             time = await self.di.get_delete_time(ctx.guild)
             if time:
-                await asyncio.sleep(time)
-                await ctx.message.delete()
+                self.scheduler.call_later(time, self.deleter.delete, ctx.message)
 
     async def on_command_error(self, ctx, exception):
         self.stats.increment("RPGBot.errors", tags=["RPGBot:errors"], host="scw-8112e8")
@@ -221,7 +283,7 @@ class Bot(commands.AutoShardedBot):
 
     @staticmethod
     def get_exp(level):
-        return int(0.1 * level ** 2 + 5 * level + 4)
+        return exp_needed(level)
 
     @staticmethod
     def get_ram():
@@ -260,6 +322,10 @@ class Bot(commands.AutoShardedBot):
 
     async def shutdown(self):
         self.session.close()
+        await self.scheduler.close()
+        await self.deleter.close()
+        await self.exp.close()
+        await self.db.close()
 
 
 prefix = ['N!','<@520550412219318272>'] if "debug" not in sys.argv else 'rp$'
@@ -282,5 +348,11 @@ description = f"A Bot for assisting with RPG made by XxKingNovaXx#0416," \
 with open("resources/auth") as af:
     _auth = json.loads(af.read())
 
-prp = Bot(command_prefix=prefix, description=description, pm_help=True)
-prp.run(_auth[0])
+
+def run(**kwargs):
+    prp = Bot(command_prefix=prefix, description=description, pm_help=True, **kwargs)
+    prp.run(_auth[0])
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,43 @@
+"""Run the bot as a cluster of worker processes, each connecting its own range of the shards.
+The workers share the database and tell each other about the records they write, see `cogs.utils.bus`.
+Only the first worker runs the web API and posts the guild count to the bot lists.
+
+Usage: python cluster.py [workers] [shard count] [memory] [writebehind], the options are passed on to every worker.
+memory gives each worker a separate in-memory store, so it's only allowed with a single worker."""
+import multiprocessing
+import sys
+
+
+def shard_ranges(shard_count, workers):
+    """Split the shards into a contiguous range for each worker"""
+    size, extra = divmod(shard_count, workers)
+    start = 0
+    for worker in range(workers):
+        end = start + size + (worker < extra)
+        yield list(range(start, end))
+        start = end
+
+
+def run_worker(worker, shard_ids, shard_count):
+    import PPGBot
+    PPGBot.run(worker=worker, shard_ids=shard_ids, shard_count=shard_count)
+
+
+def main(workers=None, shard_count=5):
+    workers = min(workers or multiprocessing.cpu_count(), shard_count)
+    if workers > 1 and "memory" in sys.argv:
+        raise SystemExit("memory storage isn't shared between workers, run a single worker to use it")
+    processes = []
+    for worker, shard_ids in enumerate(shard_ranges(shard_count, workers)):
+        process = multiprocessing.Process(target=run_worker, args=(worker, shard_ids, shard_count),
+                                          name=f"RPGBot-{worker}")
+        process.start()
+        processes.append(process)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:] if arg.isdigit()]
+    main(*args)
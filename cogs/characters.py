@@ -2,7 +2,7 @@ import discord
 from discord.ext import commands
 
 from .utils import checks
-from .utils.data import Character
+from .utils.data import Character, get_member
 from .utils.translation import _
 
 
@@ -61,7 +61,7 @@ class Characters(object):
             return
 
         try:
-            owner = discord.utils.get(ctx.guild.members, id=char.owner)
+            owner = get_member(ctx.guild, char.owner)
             embed = discord.Embed(description=char.description)
             embed.set_author(name=char.name, icon_url=owner.avatar_url)
             if char.meta.get("image"):
@@ -79,7 +79,7 @@ class Characters(object):
 
             await ctx.send(embed=embed)
         except:
-            owner = discord.utils.get(ctx.guild.members, id=char.owner)
+            owner = get_member(ctx.guild, char.owner)
             embed = discord.Embed(description=char.description)
             embed.set_author(name=ctx.author.name, icon_url=ctx.author.avatar_url)
             embed.add_field(name=await _(ctx, "Name"), value=char.name)
@@ -112,13 +112,12 @@ class Characters(object):
             await ctx.send(await _(ctx, "A character with this name already exists!"))
             return
 
-        check = lambda x: x.channel is ctx.channel and x.author is ctx.author
         character = dict(name=name, owner=user.id, meta=dict(), team=list())
         await ctx.send(
             await _(ctx, "Describe the character (Relevant character sheet) (Say `done` when you're done describing)"))
         content = ""
         while True:
-            response = await self.bot.wait_for("message", check=check, timeout=300)
+            response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=300)
             if response.content.lower() == "done":
                 break
             else:
@@ -133,7 +132,7 @@ class Characters(object):
                     "`image: http://image.com/image.jpg, hair_color: blond, nickname: Kevin` (Separate keys with commas or newlines)"
                     ))
         while True:
-            response = await self.bot.wait_for("message", check=check, timeout=300)
+            response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=300)
             if response.content.lower() == "cancel":
                 await ctx.send(await _(ctx, "Cancelling!"))
                 return
@@ -2,6 +2,7 @@ import asyncio
 from collections import Counter
 from random import choice
 import json
+import logging
 from recordclass import recordclass
 
 import discord
@@ -9,8 +10,9 @@ from async_timeout import timeout
 from discord.ext import commands
 
 from .utils import checks
-from .utils.data import MemberConverter, NumberConverter, get, chain, create_pages, IntConverter
-from .utils.translation import _
+from .utils.data import MemberConverter, NumberConverter, get_member, get_members, chain, create_pages, IntConverter
+from .utils.paginator import Paginator
+from .utils.translation import _, _many
 
 
 class Economy(object):
@@ -19,7 +21,9 @@ class Economy(object):
     def __init__(self, bot):
         self.bot = bot
         self.bids = list()
+        self.draws = dict()  # (guild id, lottery name): the Timer drawing it
         self.bot.shutdowns.append(self.shutdown)
+        self.bot.scheduler.register("lottery", self.draw_lottery, self.lottery_restored)
 
     async def shutdown(self):
         with open("resources/lotteries.json", 'w') as lf:
@@ -45,8 +49,7 @@ class Economy(object):
         """Set the balance of the given members to an amount"""
         members = chain(members)
 
-        for member in members:
-            await self.bot.di.set_eco(member, amount)
+        await self.bot.di.set_eco_many(members, amount)
 
         await ctx.send(await _(ctx, "Balances changed"))
 
@@ -57,8 +60,7 @@ class Economy(object):
         """Give the member's money (Moderators)"""
         members = chain(members)
 
-        for member in members:
-            await self.bot.di.add_eco(member, amount)
+        await self.bot.di.add_eco_many(members, amount)
 
         await ctx.send(await _(ctx, "Money given"))
 
@@ -69,8 +71,7 @@ class Economy(object):
         """Take the member's money (Moderators)"""
         members = chain(members)
 
-        for member in members:
-            await self.bot.di.add_eco(member, -amount)
+        await self.bot.di.add_eco_many(members, -amount)
 
         await ctx.send(await _(ctx, "Money taken"))
 
@@ -79,138 +80,53 @@ class Economy(object):
     async def pay(self, ctx, amount: NumberConverter, member: discord.Member):
         """Pay another user money"""
         amount = abs(amount)
-        await self.bot.di.add_eco(ctx.author, -amount)
-        await self.bot.di.add_eco(member, amount)
+        async with self.bot.di.transaction() as tr:
+            tr.add_eco(ctx.author, -amount)
+            tr.add_eco(member, amount)
         await ctx.send((await _(ctx, "Successfully paid {} dollars to {}")).format(amount, member))
 
     @checks.no_pm()
     @commands.group(aliases=["m", "pm"], invoke_without_command=True)
     async def market(self, ctx):
         """View the current market listings"""
-        um = await self.bot.di.get_guild_market(ctx.guild)
+        um = await self.upgrade_market(ctx, await self.bot.di.get_guild_market(ctx.guild))
         market = list(um.values())
-        desc = await _(ctx,
-                       "\u27A1 to see the next page"
-                       "\n\u2B05 to go back"
-                       "\n\u274C to exit"
-                       )
         if not market:
             await ctx.send(await _(ctx, "No items on the market to display."))
             return
 
-        emotes = ("\u2B05", "\u27A1", "\u274C")
-        embed = discord.Embed(description=desc, title=await _(ctx, "Player Market"))
-        embed.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon_url)
+        await self.show_listings(ctx, market, 10)
 
-        chunks = []
-        clen = 10
-        for i in range(0, len(market), clen):
-            chunks.append(market[i:i + clen])
+    async def upgrade_market(self, ctx, um):
+        """Convert listings from the old format, a list of offers under each item's name, to one listing per ID"""
+        legacy = [name for name, listing in um.items() if isinstance(listing, list)]
+        if not legacy:
+            return um
 
-        i = 0
-        try:
-            users = get(ctx.guild.members, id=[x['user'] for x in chunks[i]])
-        except Exception:
-            br = []
-            fr = dict()
-            for listing, data in um.items():
-                for datum in data:
-                    if 'item' not in listing:
-                        id = self.bot.randsample()
-                        fr[id] = dict(id=id, item=listing, user=ctx.author.id, cost=datum['cost'],
-                                      amount=datum['amount'])
-                br.append(listing)
-
-            for i in br:
-                del um[i]
-            um.update(fr)
-
-            await self.bot.di.update_guild_market(ctx.guild, um)
-            market = list(um.items())
-            chunks = []
-            for i in range(0, len(market), clen):
-                chunks.append(market[i:i + clen])
-
-            users = get(ctx.guild.members, id=[x['user'] for x in chunks[i]])
-
-        currency = await ctx.bot.di.get_currency(ctx.guild)
-
-        fin = [[x['id'], f"{x['cost']} {currency}", f"x{x['amount']}", x['item'], str(y)] for x, y in
-               zip(chunks[i], users)]
-        fin.insert(0, [await _(ctx, "ID"),
-                       await _(ctx, "COST"),
-                       await _(ctx, "NUMBER"),
-                       await _(ctx, "ITEM"),
-                       await _(ctx, "SELLER")])
-        embed.description = "```\n{}\n```".format(self.bot.format_table(fin))
+        for name in legacy:
+            for datum in um.pop(name):
+                id = self.bot.randsample()
+                um[id] = dict(id=id, item=name, user=ctx.author.id, cost=datum['cost'], amount=datum['amount'])
 
-        max = len(chunks) - 1
+        await self.bot.di.update_guild_market(ctx.guild, um)
+        return um
 
-        msg = await ctx.send(embed=embed)
-        for emote in emotes:
-            await msg.add_reaction(emote)
+    async def show_listings(self, ctx, listings, size):
+        """Page through market listings in a table, size to a page"""
+        currency = await ctx.bot.di.get_currency(ctx.guild)
+        header = await _many(ctx, "ID", "COST", "NUMBER", "ITEM", "SELLER")
 
-        while True:
-            try:
-                r, u = await self.bot.wait_for("reaction_add", check=lambda r, u: r.message.id == msg.id, timeout=80)
-            except asyncio.TimeoutError:
-                await ctx.send(await _(ctx, "Timed out! Try again"))
-                await msg.delete()
-                return
+        async def render(index):
+            chunk = listings[index * size:(index + 1) * size]
+            users = get_members(ctx.guild, [x["user"] for x in chunk])
+            fin = [[x['id'], f"{x['cost']} {currency}", f"x{x['amount']}", x['item'], str(y)] for x, y in
+                   zip(chunk, users)]
+            fin.insert(0, header)
+            return "```\n{}\n```".format(self.bot.format_table(fin)), ()
 
-            if u == ctx.guild.me:
-                continue
-
-            if u != ctx.author or r.emoji not in emotes:
-                try:
-                    await msg.remove_reaction(r.emoji, u)
-                except:
-                    pass
-                continue
-
-            if r.emoji == emotes[0]:
-                if i == 0:
-                    pass
-                else:
-                    i -= 1
-                    users = get(ctx.guild.members, id=[x["user"] for x in chunks[i]])
-                    fin = [[x['id'], f"{x['cost']} dollars", f"x{x['amount']}", x['item'], str(y)] for x, y in
-                           zip(chunks[i], users)]
-                    fin.insert(0, [await _(ctx, "ID"),
-                                   await _(ctx, "COST"),
-                                   await _(ctx, "NUMBER"),
-                                   await _(ctx, "ITEM"),
-                                   await _(ctx, "SELLER")])
-                    embed.description = "```\n{}\n```".format(self.bot.format_table(fin))
-
-                    await msg.edit(embed=embed)
-
-            elif r.emoji == emotes[1]:
-                if i == max:
-                    pass
-                else:
-                    embed.clear_fields()
-                    i += 1
-                    users = get(ctx.guild.members, id=[x["user"] for x in chunks[i]])
-                    fin = [[x['id'], f"{x['cost']} dollars", f"x{x['amount']}", x['item'], str(y)] for x, y in
-                           zip(chunks[i], users)]
-                    fin.insert(0, [await _(ctx, "ID"),
-                                   await _(ctx, "COST"),
-                                   await _(ctx, "NUMBER"),
-                                   await _(ctx, "ITEM"),
-                                   await _(ctx, "SELLER")])
-                    embed.description = "```\n{}\n```".format(self.bot.format_table(fin))
-
-                    await msg.edit(embed=embed)
-            else:
-                await msg.delete()
-                await ctx.send("Closing")
-                return
-
-            try:
-                await msg.remove_reaction(r.emoji, u)
-            except:
-                pass
+        paginator = Paginator(ctx, render, count=(len(listings) - 1) // size + 1, title=await _(ctx, "Player Market"),
+                              author=ctx.guild.name, author_url=ctx.guild.icon_url)
+        await paginator.run()
 
     @checks.no_pm()
     @market.command(aliases=["createlisting", "new", "listitem", "list"])
@@ -238,25 +154,34 @@ class Economy(object):
     async def buy(self, ctx, id: str):
         """Buy a given amount of an item from the player market at the cheapest given price"""
         market = await self.bot.di.get_guild_market(ctx.guild)
-        item = market.pop(id)
+        item = market.get(id)
 
         if not item:
             await ctx.send(await _(ctx, "That is not a valid ID!"))
             return
 
+        owner = get_member(ctx.guild, item["user"])
+        if owner is None:
+            owner = discord.Object(item["user"])
+            owner.guild = ctx.guild
+
+        def take_listing(market):
+            if market.pop(id, None) is None:
+                raise KeyError(id)
+
         try:
-            await self.bot.di.add_eco(ctx.author, -item['cost'])
+            async with self.bot.di.transaction() as tr:
+                tr.mutate_guild_section(ctx.guild, "market_items", take_listing)
+                tr.add_eco(ctx.author, -item['cost'])
+                tr.add_eco(owner, item['cost'])
+                tr.give_items(ctx.author, (item["item"], item["amount"]))
+        except KeyError:
+            await ctx.send(await _(ctx, "That is not a valid ID!"))
+            return
         except ValueError:
             await ctx.send(await _(ctx, "You cant afford this item!"))
             return
 
-        owner = discord.utils.get(ctx.guild.members, id=item["user"])
-        if owner is None:
-            owner = discord.Object(item["user"])
-            owner.guild = ctx.guild
-        await self.bot.di.add_eco(owner, item['cost'])
-        await self.bot.di.give_items(ctx.author, (item["item"], item["amount"]))
-        await self.bot.di.update_guild_market(ctx.guild, market)
         await ctx.send(await _(ctx, "Items successfully bought"))
         if not isinstance(owner, discord.Object):
             await owner.send((await _(ctx,
@@ -267,129 +192,13 @@ class Economy(object):
     @market.command()
     async def search(self, ctx, *, item: str):
         """Search the market for an item"""
-        um = await self.bot.di.get_guild_market(ctx.guild)
+        um = await self.upgrade_market(ctx, await self.bot.di.get_guild_market(ctx.guild))
         market = [i for i in um.values() if i['item'] == item]
-        desc = await _(ctx, """
-        \u27A1 to see the next page
-        \u2B05 to go back
-        \u274C to exit
-        """)
         if not market:
             await ctx.send(await _(ctx, "No items on the market to display."))
             return
 
-        emotes = ("\u2B05", "\u27A1", "\u274C")
-        embed = discord.Embed(description=desc, title=await _(ctx, "Player Market"))
-        embed.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon_url)
-
-        chunks = []
-        for i in range(0, len(market), 25):
-            chunks.append(market[i:i + 25])
-
-        i = 0
-        try:
-            users = get(ctx.guild.members, id=[x['user'] for x in chunks[i]])
-        except Exception:
-            br = []
-            fr = dict()
-            for listing, data in um.items():
-                for datum in data:
-                    if 'item' not in listing:
-                        id = self.bot.randsample()
-                        fr[id] = dict(id=id, item=listing, user=ctx.author.id, cost=datum['cost'],
-                                      amount=datum['amount'])
-                br.append(listing)
-
-            for i in br:
-                del um[i]
-            um.update(fr)
-
-            await self.bot.di.update_guild_market(ctx.guild, um)
-            market = list(um.items())
-            chunks = []
-            for i in range(0, len(market), 25):
-                chunks.append(market[i:i + 25])
-
-            users = get(ctx.guild.members, id=[x['user'] for x in chunks[i]])
-
-        # items = [f"{x['id']}\t| {x['cost']} dollars\t| x{x['amount']}\t| {x['item']}\t| {y.mention}" for x, y in zip(chunks[i], users)]
-        # items.insert(0, "ID\t\t| COST\t\t| NUMBER\t\t| ITEM\t\t| SELLER")
-        fin = [[x['id'], f"{x['cost']} dollars", f"x{x['amount']}", x['item'], str(y)] for x, y in
-               zip(chunks[i], users)]
-        fin.insert(0, [await _(ctx, "ID"),
-                       await _(ctx, "COST"),
-                       await _(ctx, "NUMBER"),
-                       await _(ctx, "ITEM"),
-                       await _(ctx, "SELLER")])
-        embed.description = "```\n{}\n```".format(self.bot.format_table(fin))
-
-        max = len(chunks) - 1
-
-        msg = await ctx.send(embed=embed)
-        for emote in emotes:
-            await msg.add_reaction(emote)
-
-        while True:
-            try:
-                r, u = await self.bot.wait_for("reaction_add", check=lambda r, u: r.message.id == msg.id, timeout=80)
-            except asyncio.TimeoutError:
-                await ctx.send(await _(ctx, "Timed out! Try again"))
-                await msg.delete()
-                return
-
-            if u == ctx.guild.me:
-                continue
-
-            if u != ctx.author or r.emoji not in emotes:
-                try:
-                    await msg.remove_reaction(r.emoji, u)
-                except:
-                    pass
-                continue
-
-            if r.emoji == emotes[0]:
-                if i == 0:
-                    pass
-                else:
-                    i -= 1
-                    users = get(ctx.guild.members, id=[x["user"] for x in chunks[i]])
-                    fin = [[x['id'], f"{x['cost']} dollars", f"x{x['amount']}", x['item'], str(y)] for x, y in
-                           zip(chunks[i], users)]
-                    fin.insert(0, [await _(ctx, "ID"),
-                                   await _(ctx, "COST"),
-                                   await _(ctx, "NUMBER"),
-                                   await _(ctx, "ITEM"),
-                                   await _(ctx, "SELLER")])
-                    embed.description = "```\n{}\n```".format(self.bot.format_table(fin))
-
-                    await msg.edit(embed=embed)
-
-            elif r.emoji == emotes[1]:
-                if i == max:
-                    pass
-                else:
-                    embed.clear_fields()
-                    i += 1
-                    users = get(ctx.guild.members, id=[x["user"] for x in chunks[i]])
-                    fin = [[x['id'], f"{x['cost']} dollars", f"x{x['amount']}", x['item'], str(y)] for x, y in
-                           zip(chunks[i], users)]
-                    fin.insert(0, [await _(ctx, "ID"),
-                                   await _(ctx, "COST"),
-                                   await _(ctx, "NUMBER"),
-                                   await _(ctx, "ITEM"),
-                                   await _(ctx, "SELLER")])
-                    embed.description = "```\n{}\n```".format(self.bot.format_table(fin))
-
-                    await msg.edit(embed=embed)
-            else:
-                await msg.delete()
-                await ctx.send(await _(ctx, "Closing"))
-                return
-
-            try:
-                await msg.remove_reaction(r.emoji, u)
-            except:
-                pass
+        await self.show_listings(ctx, market, 25)
 
     @checks.no_pm()
     @market.command(aliases=["rm"], name="remove")
@@ -439,6 +248,10 @@ class Economy(object):
             del self.bot.lotteries[ctx.guild.id][name]
         except KeyError:
             await ctx.send(await _(ctx, "There is no lottery of that name!"))
+            return
+        timer = self.draws.pop((ctx.guild.id, name), None)
+        if timer is not None:
+            self.bot.scheduler.cancel(timer)
 
     @checks.no_pm()
     @checks.mod_or_permissions()
@@ -452,17 +265,38 @@ class Economy(object):
             return
         current = dict(jackpot=jackpot, players=list(), channel=ctx.channel.id)
         self.bot.lotteries[ctx.guild.id][name] = current
+        # Saved with the lottery, so it's still drawn if the bot restarts before then
+        self.draws[(ctx.guild.id, name)] = await self.bot.scheduler.schedule(time, "lottery", save=True,
+                                                                            guild=ctx.guild.id, name=name,
+                                                                            lottery=current)
         await ctx.send(await _(ctx, "Lottery created!"))
-        await asyncio.sleep(time)
+
+    def lottery_restored(self, timer):
+        guild, name = timer.kwargs["guild"], timer.kwargs["name"]
+        self.bot.lotteries.setdefault(guild, dict())[name] = timer.kwargs["lottery"]
+        self.draws[(guild, name)] = timer
+
+    async def draw_lottery(self, guild, name, lottery):
+        self.draws.pop((guild, name), None)
+        current = self.bot.lotteries.get(guild, dict()).pop(name, None)
+        guild_id, guild = guild, self.bot.get_guild(guild)
+        if current is not None and guild is None:
+            # Saved on a worker that no longer runs the guild's shard, or the bot has left it
+            logging.warning(f"Dropped lottery {name} of guild {guild_id}, it isn't on worker {self.bot.worker}")
+            return
+        channel = guild.get_channel(lottery["channel"]) if guild else None
+        if current is None or channel is None:
+            return
+
+        translate = self.bot.translations.translate
         if current["players"]:
-            winner = discord.utils.get(ctx.guild.members, id=choice(current["players"]))
+            winner = get_member(guild, choice(current["players"]))
             await self.bot.di.add_eco(winner, current["jackpot"])
-            await ctx.send(
-                (await _(ctx, "Lottery {} is now over!\n{} won {}! Congratulations!")).format(name, winner.mention,
-                                                                                              current["jackpot"]))
+            await channel.send(
+                (await translate(guild, "Lottery {} is now over!\n{} won {}! Congratulations!"))[0].format(
+                    name, winner.mention, current["jackpot"]))
         else:
-            await ctx.send((await _(ctx, "Nobody entered {}! Its over now.")).format(name))
-        del self.bot.lotteries[ctx.guild.id][name]
+            await channel.send((await translate(guild, "Nobody entered {}! Its over now."))[0].format(name))
 
     @checks.no_pm()
     @lotto.command(aliases=["join"])
@@ -472,6 +306,7 @@ class Economy(object):
             if name in self.bot.lotteries[ctx.guild.id]:
                 if ctx.author.id not in self.bot.lotteries[ctx.guild.id][name]["players"]:
                     self.bot.lotteries[ctx.guild.id][name]["players"].append(ctx.author.id)
+                    await self.bot.scheduler.save(self.draws[(ctx.guild.id, name)])
                     await ctx.send(await _(ctx, "Lotto entered!"))
                 else:
                     await ctx.send(await _(ctx, "You're already in this lotto!"))
@@ -521,21 +356,19 @@ class Economy(object):
         -> 0
         -> 10
         Can be sold for 10 and cannot be bought. Must be an existing item! Requires Bot Moderator or Admin"""
-        gd = await self.bot.db.get_guild_data(ctx.guild)
-        if name not in gd["items"]:
+        if name not in await self.bot.db.get_guild_section(ctx.guild, "items"):
             await ctx.send(await _(ctx, "This item doesn't exist!"))
             return
 
-        shop = gd.get("shop_items", dict())
+        shop = await self.bot.di.get_guild_shop(ctx.guild)
         item = dict(buy=0, sell=0, level=0)
         shop[name] = item
-        check = lambda x: x.author is ctx.author and x.channel is ctx.channel
 
         await ctx.send(await _(ctx, "Say 'cancel' to cancel or 'skip' to skip a step"))
         try:
             while True:
                 await ctx.send(await _(ctx, "How much should this be buyable for? 0 for not buyable"))
-                resp = await self.bot.wait_for("message", check=check)
+                resp = await self.bot.waiters.message(ctx.channel, ctx.author)
                 try:
                     item["buy"] = float(resp.content)
                 except ValueError:
@@ -547,7 +380,7 @@ class Economy(object):
 
             while True:
                 await ctx.send(await _(ctx, "How much should this be sellable for? 0 for not sellable"))
-                resp = await self.bot.wait_for("message", check=check)
+                resp = await self.bot.waiters.message(ctx.channel, ctx.author)
                 try:
                     item["sell"] = float(resp.content)
                 except ValueError:
@@ -559,7 +392,7 @@ class Economy(object):
 
             while True:
                 await ctx.send(await _(ctx, "What is the minimum level a user must be for this item? 0 for no minimum"))
-                resp = await self.bot.wait_for("message", check=check)
+                resp = await self.bot.waiters.message(ctx.channel, ctx.author)
                 try:
                     item["level"] = int(resp.content)
                 except ValueError:
@@ -662,8 +495,8 @@ class Economy(object):
         try:
             with timeout(60, loop=self.bot.loop):
                 while True:
-                    resp = await self.bot.wait_for("message", check=lambda x: x.content.startswith(
-                        "rp!bid") and x.channel == ctx.channel)
+                    resp = await self.bot.waiters.message(ctx.channel,
+                                                          check=lambda x: x.content.startswith("rp!bid"))
                     try:
                         bid = abs(int(resp.content[6:]))
                         if bid < startbid:
@@ -684,13 +517,15 @@ class Economy(object):
 
         for x in range(len(cb)):
             winner, wamount = cb.most_common(x + 1)[x]
-            wb = await self.bot.di.get_balance(winner)
-            if wb >= wamount:
-                await ctx.send((await _(ctx, "{} won the bid for {} dollars!")).format(winner, amount))
-                await self.bot.di.add_eco(winner, -wamount)
-                await self.bot.di.add_eco(ctx.author, wamount)
-                await self.bot.di.give_items(winner, (item, amount))
-                break
+            try:
+                async with self.bot.di.transaction() as tr:
+                    tr.add_eco(winner, -wamount)
+                    tr.add_eco(ctx.author, wamount)
+                    tr.give_items(winner, (item, amount))
+            except ValueError:
+                continue
+            await ctx.send((await _(ctx, "{} won the bid for {} dollars!")).format(winner, amount))
+            break
         else:
             await ctx.send(await _(ctx, "Nobody bid and had enough money to pay for it!"))
             await self.bot.di.give_items(ctx.author, (item, amount))
@@ -706,14 +541,10 @@ class Economy(object):
     @commands.command()
     async def baltop(self, ctx):
         """Get the top 10 server balances"""
-        req = f"""SELECT (UUID, info->'{ctx.guild.id}'->>'money') FROM userdata;"""
-        async with self.bot.db._conn.acquire() as connection:
-            resp = await connection.fetch(req)
-
-        users = [(discord.utils.get(ctx.guild.members, id=int(x["row"][0])), x["row"][1]) for x in resp if
-                 (len(x["row"]) == 2) and (x["row"][1] is not None)]
-        users = [x for x in users if x[0]]
-        users.sort(key=lambda x: -float(x[1]))
+        resp = await self.bot.db.get_leaderboard(ctx.guild, "money", 10,
+                                                 present=lambda user_id: get_member(ctx.guild, user_id))
+
+        users = [(get_member(ctx.guild, user_id), money) for user_id, (money,) in resp]
 
         currency = await ctx.bot.di.get_currency(ctx.guild)
         msg = "\n".join(f"{x}: {y[0]} {y[1]} {currency}" for x, y in zip(range(1, 11), users))
@@ -4,8 +4,9 @@ import discord
 import asyncio
 from collections import Counter
 
-from .utils.data import Guild, NumberConverter, validate_url
+from .utils.data import Guild, NumberConverter, validate_url, get_member, get_members
 from .utils import checks
+from .utils.paginator import Paginator
 from .utils.translation import _
 
 
@@ -32,16 +33,11 @@ class Groups(object):
             await ctx.send(await _(ctx, "That guild doesn't exist here!"))
             return
 
-        if len(guild.members) <= 20:
-            cmem = guild.members
-        else:
-            cmem = guild.members[20:]
-
-        mobj = (discord.utils.get(ctx.guild.members, id=x) for x in cmem)
+        mobj = get_members(ctx.guild, list(guild.members)[:20])
 
         members = "\n".join([u.mention for u in mobj if u])
         if len(guild.members) > 20:
-            members = members + (await _(ctx, "\nAnd {} more...")).format(guild.members - 20)
+            members = members + (await _(ctx, "\nAnd {} more...")).format(len(guild.members) - 20)
 
         litems = guild.items.items() if len(guild.items) < 20 else list(guild.items.items())[20:]
         items = "\n".join(f"{x} x{y}" for x, y in litems)
@@ -53,13 +49,15 @@ class Groups(object):
         if guild.image is not None:
             embed.set_image(url=guild.image)
 
-        owner = discord.utils.get(ctx.guild.members, id=guild.owner)
+        owner = get_member(ctx.guild, guild.owner)
         oment = owner.mention if owner else "Not in server"
         currency = await ctx.bot.di.get_currency(ctx.guild)
 
         embed.add_field(name=await _(ctx, "Owner"), value=oment)
         embed.add_field(name=await _(ctx, "Open"), value=str(guild.open))
         embed.add_field(name=await _(ctx, "Bank Balance"), value=f"{guild.bank} {currency}")
+        if guild.interest:
+            embed.add_field(name=await _(ctx, "Daily Interest"), value=f"{guild.interest * 100:g}%")
         embed.add_field(name=await _(ctx, "Members"), value=members or await _(ctx, "None"))
         embed.add_field(name=await _(ctx, "Items"), value=items or await _(ctx, "None"))
 
@@ -70,87 +68,26 @@ class Groups(object):
     async def guilds(self, ctx):
         """List guilds"""
         guilds = list((await self.bot.di.get_guild_guilds(ctx.guild)).items())
-        embed = discord.Embed()
-        embed.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon_url)
-
         if not guilds:
             await ctx.send(await _(ctx, "No guilds to display."))
             return
 
+        fmt = await _(ctx, "Owner: {}\nMembers: {}\nOpen: {}")
+
+        async def render(index):
+            chunk = guilds[index * 25:(index + 1) * 25]
+            owners = get_members(ctx.guild, [value.owner for item, value in chunk])
+            return None, [(item, fmt.format(owner, len(value.members), value.open))
+                          for (item, value), owner in zip(chunk, owners)]
+
         desc = await _(ctx, """
         \u27A1 to see the next page
         \u2B05 to go back
         \u274C to exit
         """)
-
-        emotes = ("\u2B05", "\u27A1", "\u274C")
-        embed = discord.Embed(description=desc, title="Server Guilds")
-        embed.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon_url)
-
-        chunks = []
-        for i in range(0, len(guilds), 25):
-            chunks.append(guilds[i:i + 25])
-
-        i = 0
-        for item, value in chunks[i]:
-            fmt = (await _(ctx, "Owner: {}\nMembers: {}\nOpen: {}")).format(
-                discord.utils.get(ctx.guild.members, id=int(value.owner)), len(value.members), value.open)
-            embed.add_field(name=item, value=fmt)
-
-        max = len(chunks) - 1
-
-        msg = await ctx.send(embed=embed)
-        for emote in emotes:
-            await msg.add_reaction(emote)
-
-        while True:
-            try:
-                r, u = await self.bot.wait_for("reaction_add", check=lambda r, u: r.message.id == msg.id, timeout=80)
-            except asyncio.TimeoutError:
-                await ctx.send(await _(ctx, "Timed out! Try again"))
-                await msg.delete()
-                return
-
-            if u == ctx.guild.me:
-                continue
-
-            if u != ctx.author or r.emoji not in emotes:
-                try:
-                    await msg.remove_reaction(r.emoji, u)
-                except:
-                    pass
-                continue
-
-            if r.emoji == emotes[0]:
-                if i == 0:
-                    pass
-                else:
-                    embed.clear_fields()
-                    i -= 1
-                    for emote in emotes:
-                        await msg.add_reaction(emote)
-
-                    await msg.edit(embed=embed)
-
-            elif r.emoji == emotes[1]:
-                if i == max:
-                    pass
-                else:
-                    embed.clear_fields()
-                    i += 1
-                    for emote in emotes:
-                        await msg.add_reaction(emote)
-
-                    await msg.edit(embed=embed)
-            else:
-                await msg.delete()
-                await ctx.send(await _(ctx, "Closing"))
-                return
-
-            try:
-                await msg.remove_reaction(r.emoji, u)
-            except:
-                pass
+        paginator = Paginator(ctx, render, count=(len(guilds) - 1) // 25 + 1, title="Server Guilds", description=desc,
+                              author=ctx.guild.name, author_url=ctx.guild.icon_url)
+        await paginator.run()
 
     @guild.command()
     async def info(self, ctx, *, name: str):
@@ -160,10 +97,10 @@ class Groups(object):
             await ctx.send(await _(ctx, "That guild doesn't exist here!"))
             return
 
-        members = "\n".join([discord.utils.get(ctx.guild.members, id=x).mention for x in
-                             (guild.members if len(guild.members) <= 20 else ctx.members[20:])])
+        mobj = get_members(ctx.guild, list(guild.members)[:20])
+        members = "\n".join([u.mention for u in mobj if u])
         if len(guild.members) > 20:
-            members = members + (await _(ctx, "\nAnd {} more...")).format(guild.members - 20)
+            members = members + (await _(ctx, "\nAnd {} more...")).format(len(guild.members) - 20)
 
         litems = guild.items.items() if len(guild.items) < 20 else list(guild.items.items())[20:]
         items = "\n".join(f"{x} x{y}" for x, y in litems)
@@ -175,7 +112,8 @@ class Groups(object):
         if guild.image is not None:
             embed.set_image(url=guild.image)
 
-        embed.add_field(name=await _(ctx, "Owner"), value=discord.utils.get(ctx.guild.members, id=guild.owner).mention)
+        owner = get_member(ctx.guild, guild.owner)
+        embed.add_field(name=await _(ctx, "Owner"), value=owner.mention if owner else "Not in server")
         embed.add_field(name=await _(ctx, "Open"), value=str(guild.open))
         embed.add_field(name=await _(ctx, "Bank Balance"), value=f"{guild.bank}")
         embed.add_field(name=await _(ctx, "Members"), value=members or await _(ctx, "None"))
@@ -200,7 +138,6 @@ class Groups(object):
             await ctx.send(await _(ctx, "You already own a guild!"))
             return
         try:
-            check = lambda x: x.channel is ctx.channel and x.author is ctx.author
             guild = dict(name=name,
                          owner=ctx.author.id,
                          description="",
@@ -212,7 +149,7 @@ class Groups(object):
                          invites=set())
             await ctx.send(await _(ctx, "'cancel' or 'skip' to cancel creation or skip a step"))
             await ctx.send(await _(ctx, "Describe the Guild (guild description)"))
-            response = await self.bot.wait_for("message", check=check, timeout=120)
+            response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=120)
             if response.content.lower() == "cancel":
                 await ctx.send(await _(ctx, "Cancelling!"))
                 return
@@ -222,7 +159,7 @@ class Groups(object):
                 guild["description"] = response.content
             await ctx.send(
                 await _(ctx, "Is this guild open to everyone? Or is an invite necessary? (yes or no, no is assumed)"))
-            response = await self.bot.wait_for("message", timeout=60, check=check)
+            response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
             if response.content.lower() == "cancel":
                 await ctx.send(await _(ctx, "Cancelling!"))
                 return
@@ -234,7 +171,7 @@ class Groups(object):
 
             await ctx.send(await _(ctx, "If you'd like give a URL to an image for the guild"))
             while True:
-                response = await self.bot.wait_for("message", timeout=60, check=check)
+                response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
                 if response.content.lower() == "cancel":
                     await ctx.send(await _(ctx, "Cancelling!"))
                     return
@@ -250,7 +187,7 @@ class Groups(object):
 
             await ctx.send(await _(ctx, "Finally, you can also set an icon for the guild"))
             while True:
-                response = await self.bot.wait_for("message", timeout=60, check=check)
+                response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
                 if response.content.lower() == "cancel":
                     await ctx.send(await _(ctx, "Cancelling!"))
                     return
@@ -314,8 +251,7 @@ class Groups(object):
         if guild.owner == ctx.author.id:
             try:
                 await ctx.send(await _(ctx, "Guild will be deleted is this alright? {yes / no}"))
-                resp = await self.bot.wait_for("message",
-                                               check=lambda x: x.author is ctx.author and x.channel is ctx.channel)
+                resp = await self.bot.waiters.message(ctx.channel, ctx.author)
             except TimeoutError:
                 await ctx.send(await _(ctx, "Didn't respond in time! Cancelling"))
 
@@ -392,8 +328,7 @@ class Groups(object):
 
         await ctx.send(await _(ctx, "Are you sure you want to delete the guild? {yes/no}"))
         try:
-            resp = await self.bot.wait_for("message", timeout=60,
-                                           check=lambda x: x.author is ctx.author and x.channel == ctx.channel)
+            resp = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
         except asyncio.TimeoutError:
             await ctx.send(await _(ctx, "Timed out! Try again"))
             return
@@ -416,16 +351,17 @@ class Groups(object):
                     await ctx.send(await _(ctx, "You aren't in a guild!"))
                     return
 
-            guilds = await self.bot.di.get_guild_guilds(ctx.guild)
-            guild = guilds.get(guild_name)
+            if guild_name not in await self.bot.di.get_guild_guilds(ctx.guild):
+                await ctx.send(await _(ctx, "That guild doesn't exist here!"))
+                return
+
             try:
                 await self.bot.di.add_eco(ctx.author, -amount)
             except ValueError:
                 await ctx.send(await _(ctx, "You don't have enough to deposit!"))
                 return
 
-            guild.bank += amount
-            await self.bot.di.update_guild_guilds(ctx.guild, guilds)
+            await self.bot.di.add_guild_bank(ctx.guild, guild_name, amount)
             await ctx.send(
                 (await _(ctx, "Successfully deposited {} dollars into {}'s bank")).format(amount, guild_name))
         except:
@@ -447,16 +383,28 @@ class Groups(object):
             await ctx.send(await _(ctx, "Only mods can withdraw money!"))
             return
 
-        await self.bot.di.add_eco(ctx.author, amount)
-
-        guild.bank -= amount
-        if guild.bank < 0:
+        try:
+            await self.bot.di.add_guild_bank(ctx.guild, ug, -amount)
+        except ValueError:
             await ctx.send(await _(ctx, "Cannot withdraw more than the guild has!"))
             return
 
-        await self.bot.di.update_guild_guilds(ctx.guild, guilds)
+        await self.bot.di.add_eco(ctx.author, amount)
         await ctx.send((await _(ctx, "Successfully withdrew {} dollars")).format(amount))
 
+    @guild.command()
+    @checks.no_pm()
+    @checks.mod_or_permissions()
+    async def interest(self, ctx, rate: NumberConverter, *, guild_name: str):
+        """Set the daily interest a guild's bank earns, in percent. Interest is added each day (Moderators)
+        Example: rp!guild interest 0.5 Knights"""
+        if guild_name not in await self.bot.di.get_guild_guilds(ctx.guild):
+            await ctx.send(await _(ctx, "That guild doesn't exist here!"))
+            return
+
+        await self.bot.di.set_guild_interest(ctx.guild, guild_name, abs(rate) / 100)
+        await ctx.send((await _(ctx, "{}'s bank now earns {}% interest daily")).format(guild_name, abs(rate)))
+
     @guild.command()
     @checks.no_pm()
     async def setmod(self, ctx, *members: discord.Member):
@@ -1,6 +1,5 @@
 from discord.ext import commands
 import discord
-import asyncio
 
 from .utils.data import MemberConverter, ItemOrNumber, chain, IntConverter, create_pages, parse_varargs, chunkn
 from .utils import checks
@@ -42,8 +41,7 @@ class Inventory(object):
         members = chain(members)
 
         num = abs(num)
-        for member in members:
-            await self.bot.di.take_items(member, (item, num))
+        await self.bot.di.take_items_many(members, (item, num))
 
         await ctx.send(await _(ctx, "Items taken!"))
 
@@ -61,8 +59,7 @@ class Inventory(object):
             return
 
         num = abs(num)
-        for member in members:
-            await self.bot.di.give_items(member, (item, num))
+        await self.bot.di.give_items_many(members, (item, num))
 
         await ctx.send(await _(ctx, "Items given!"))
 
@@ -91,10 +88,7 @@ class Inventory(object):
 
         members = chain(members)
 
-        for member in members:
-            ud = await self.bot.db.get_user_data(member)
-            ud["items"] = {}
-            await self.bot.db.update_user_data(member, ud)
+        await self.bot.di.wipe_many(members)
         await ctx.send(await _(ctx, "Wiped all inventories"))
 
     @commands.command()
@@ -209,27 +203,27 @@ class Inventory(object):
             await ctx.send(await _(ctx, "That is not a valid lootbox"))
             return
 
-        cost = box["cost"]
-        if isinstance(cost, (str, tuple, list)):
-            cost, val = cost if isinstance(cost, (tuple, list)) else (cost, 1)
-            try:
-                await self.bot.di.take_items(ctx.author, (cost, val))
-            except ValueError:
-                await ctx.send((await _(ctx, "You do not have {} {}")).format(val, cost))
-                return
-        else:
-            try:
-                await self.bot.di.add_eco(ctx.author, -cost)
-            except ValueError:
-                await ctx.send(await _(ctx, "You cant afford this box"))
-                return
-
         winitems = []
         for item, amount in box["items"].items():
             winitems += [item] * amount
 
         result = choice(winitems)
-        await self.bot.di.give_items(ctx.author, (result, 1))
+        cost = box["cost"]
+        try:
+            async with self.bot.di.transaction() as tr:
+                if isinstance(cost, (str, tuple, list)):
+                    cost, val = cost if isinstance(cost, (tuple, list)) else (cost, 1)
+                    tr.take_items(ctx.author, (cost, val))
+                else:
+                    tr.add_eco(ctx.author, -cost)
+                tr.give_items(ctx.author, (result, 1))
+        except ValueError:
+            if isinstance(cost, str):
+                await ctx.send((await _(ctx, "You do not have {} {}")).format(val, cost))
+            else:
+                await ctx.send(await _(ctx, "You cant afford this box"))
+            return
+
         await ctx.send((await _(ctx, "You won a(n) {}")).format(result))
 
     @checks.no_pm()
@@ -251,8 +245,11 @@ class Inventory(object):
         """Send a trade offer to another user. Usage: rp!inventory offer @Henry bananax3 applex1 --Format items as {item}x{#}"""
         self.trades[other] = (ctx, items)
         await ctx.send("Say rp!respond @User ")
-        await asyncio.sleep(300)
-        if self.trades.pop(other) is None:
+        self.bot.scheduler.call_later(300, self.offer_expired, ctx, other)
+
+    async def offer_expired(self, ctx, other):
+        if other in self.trades and self.trades[other][0] is ctx:
+            del self.trades[other]
             await ctx.send((await _(ctx, "{} failed to respond")).format(other))
 
     @commands.command()
@@ -266,8 +263,6 @@ class Inventory(object):
             already = None
 
             def check(message):
-                if not (message.channel == ctx.channel):
-                    return False
                 if not message.content.startswith(("rp!accept", "rp!decline",)):
                     return False
                 if message.author in (other, sender):
@@ -281,9 +276,7 @@ class Inventory(object):
                     return False
 
             try:
-                msg = await self.bot.wait_for("message",
-                                              timeout=30,
-                                              check=check)
+                msg = await self.bot.waiters.message(ctx.channel, check=check, timeout=30)
             except TimeoutError:
                 msg = None
 
@@ -301,9 +294,7 @@ class Inventory(object):
             already = msg.author
 
             try:
-                msg2 = await self.bot.wait_for("message",
-                                               timeout=30,
-                                               check=check)
+                msg2 = await self.bot.waiters.message(ctx.channel, check=check, timeout=30)
             except TimeoutError:
                 msg2 = None
 
@@ -382,8 +373,9 @@ class Inventory(object):
                                                                                             uinv.get(item)))
                 return
 
-        await ctx.bot.di.take_items(ctx.author, *((a, b * number) for a, b in recipe[0].items()))
-        await ctx.bot.di.give_items(ctx.author, *((a, b * number) for a, b in recipe[1].items()))
+        async with ctx.bot.di.transaction() as tr:
+            tr.take_items(ctx.author, *((a, b * number) for a, b in recipe[0].items()))
+            tr.give_items(ctx.author, *((a, b * number) for a, b in recipe[1].items()))
 
         await ctx.send((await _(ctx, "Successfully crafted {} {}")).format(number, name))
 
@@ -461,9 +453,7 @@ class Inventory(object):
                                     "Applex5 Breadx2"))
         while True:
             try:
-                inmsg = await ctx.bot.wait_for("message",
-                                               check=lambda x: x.author == ctx.author and (x.channel == ctx.channel),
-                                               timeout=120)
+                inmsg = await ctx.bot.waiters.message(ctx.channel, ctx.author, timeout=120)
                 if inmsg.content == "cancel":
                     await ctx.send(await _(ctx, "Cancelling!"))
                 inmsgparts = parse_varargs(inmsg.content)
@@ -483,9 +473,7 @@ class Inventory(object):
                                     "\"Apple Piex1\""))
         while True:
             try:
-                outmsg = await ctx.bot.wait_for("message",
-                                                check=lambda x: x.author == ctx.author and (x.channel == ctx.channel),
-                                                timeout=120)
+                outmsg = await ctx.bot.waiters.message(ctx.channel, ctx.author, timeout=120)
                 if outmsg.content == "cancel":
                     await ctx.send(await _(ctx, "Cancelling!"))
                     return
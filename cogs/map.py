@@ -118,10 +118,9 @@ class Mapping:
         generators = []
         spawners = {}
 
-        check = lambda x: x.channel.id == ctx.channel.id and x.author.id == ctx.author.id
         while True:
             await ctx.send(await _(ctx, "What kind of tile is it? Say `done` when done"))
-            msg = await self.bot.wait_for("message", check=check, timeout=60)
+            msg = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
             tile = msg.content.strip()
             if tile == "done":
                 break
@@ -131,7 +130,7 @@ class Mapping:
                                    "What things might spawn in those tiles? Split terms with commas. (Equal chance of each, repeat a term "
                                    "for greater chance) `skip` to skip"
                                    ))
-            msg = await self.bot.wait_for("message", check=check, timeout=60)
+            msg = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
             if msg.content.lower() == "skip":
                 continue
             spawners[(len(generators) - 1) if tile != "*" else -1] = Counter(x.strip() for x in msg.content.split(","))
@@ -196,10 +195,9 @@ class Mapping:
         generators = []
         spawners = {}
 
-        check = lambda x: x.channel.id == ctx.channel.id and x.author.id == ctx.author.id
         while True:
             await ctx.send(await _(ctx, "What kind of tile is it? Say `done` when done"))
-            msg = await self.bot.wait_for("message", check=check, timeout=60)
+            msg = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
             tile = msg.content.strip()
             if tile == "done":
                 break
@@ -209,7 +207,7 @@ class Mapping:
                                    "What things might spawn in those tiles? Split terms with commas. (Equal chance of each, repeat a term "
                                    "for greater chance) `skip` to skip"
                                    ))
-            msg = await self.bot.wait_for("message", check=check, timeout=60)
+            msg = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
             if msg.content.lower() == "skip":
                 continue
             spawners[(len(generators) - 1) if tile != "*" else -1] = Counter(x.strip() for x in msg.content.split(","))
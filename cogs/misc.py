@@ -139,7 +139,7 @@ class Misc(object):
         embed.add_field(name=await _(ctx, "Author"), value='Henry#6174 (Discord ID: 122739797646245899)')
         embed.add_field(name=await _(ctx, "Library"), value='discord.py (Python)')
         embed.add_field(name=await _(ctx, "Uptime"), value=await self.bot.get_bot_uptime())
-        embed.add_field(name=await _(ctx, "Servers"), value=(await _(ctx, "{} servers")).format(len(self.bot.guilds)))
+        embed.add_field(name=await _(ctx, "Servers"), value=(await _(ctx, "{} servers")).format(self.bot.guild_count()))
         embed.add_field(name=await _(ctx, "Commands Run"),
                         value=(await _(ctx, '{} commands')).format(sum(self.bot.commands_used.values())))
 
@@ -248,6 +248,23 @@ class Misc(object):
         fmt = '%s socket events observed (%.2f/minute):\n%s'
         await ctx.send(fmt % (total, cpm, self.bot.socket_stats))
 
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def cachestats(self, ctx):
+        fmt = '%s: %s hits, %s misses (%.2f%%), %s entries using %.2f/%.2fMB'
+        lines = []
+        for name, stats in self.bot.db.cache_stats().items():
+            lines.append(fmt % (name, stats["hits"], stats["misses"], stats["ratio"] * 100, stats["entries"],
+                                stats["size"] / 0x100_000, stats["budget"] / 0x100_000))
+        buffered = self.bot.db.buffer_stats()
+        if buffered is not None:
+            lines.append('write buffer: %s pending, %s records written in %s flushes' % (
+                buffered["pending"], buffered["written"], buffered["flushes"]))
+        scheduled = self.bot.scheduler.stats()
+        lines.append('scheduler: %s pending, %s run, %s failed, last ran %.2fs late' % (
+            scheduled["pending"], scheduled["fired"], scheduled["failed"], scheduled["lag"]))
+        await ctx.send("\n".join(lines))
+
     @commands.command(hidden=True)
     @commands.is_owner()
     async def makedoc(self, ctx):
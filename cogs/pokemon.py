@@ -46,11 +46,10 @@ class Pokemon(object):
     async def create(self, ctx):
         """Create a new Pokemon to add to your box"""
         try:
-            check = lambda x: x.channel is ctx.channel and x.author is ctx.author
             pokemon = dict()
             await ctx.send(await _(ctx, "In any step type 'cancel' to cancel"))
             await ctx.send(await _(ctx, "What will its nickname be?"))
-            response = await self.bot.wait_for("message", check=check, timeout=60)
+            response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
             if response.content.lower() == "cancel":
                 await ctx.send(await _(ctx, "Cancelled"))
                 return
@@ -58,7 +57,7 @@ class Pokemon(object):
                 pokemon["name"] = response.content
 
             await ctx.send(await _(ctx, "What species of Pokemon is it?"))
-            response = await self.bot.wait_for("message", check=check, timeout=60)
+            response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
             if response.content.lower() == "cancel":
                 await ctx.send(await _(ctx, "Cancelled"))
                 return
@@ -79,7 +78,7 @@ class Pokemon(object):
                            await _(ctx, "spdef"),
                            await _(ctx, "speed")]
             while True:
-                response = await self.bot.wait_for("message", check=check, timeout=120)
+                response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=120)
                 if response.content.lower() == "cancel":
                     await ctx.send(await _(ctx, "Cancelled"))
                     return
@@ -112,7 +111,7 @@ class Pokemon(object):
                                         "nature: hasty, color: brown)"))
 
             while True:
-                response = await self.bot.wait_for("message", check=check, timeout=120)
+                response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=120)
                 if response.content.lower() == "cancel":
                     await ctx.send(await _(ctx, "Cancelling!"))
                     return
@@ -180,9 +179,8 @@ class Pokemon(object):
 
         await ctx.send(await _(ctx, "Say rp!accept or rp!decline to respond to the trade!"))
         try:
-            resp = await self.bot.wait_for("message", timeout=120, check=lambda
-                x: x.author == other and x.channel == ctx.channel and ctx.message.content in ["rp!accept",
-                                                                                              "rp!decline"])
+            resp = await self.bot.waiters.message(ctx.channel, other, timeout=120,
+                                                  check=lambda x: x.content in ["rp!accept", "rp!decline"])
         except asyncio.TimeoutError:
             await ctx.send(await _(ctx, "Failed to respond in time! Cancelling."))
             return
@@ -209,8 +207,8 @@ class Pokemon(object):
 
             your_pokemon["id"], their_pokemon["id"] = their_pokemon["id"], your_pokemon["id"]
 
-            await self.bot.db.update_user_data(ctx.author, yud)
-            await self.bot.db.update_user_data(other, tud)
+            await self.bot.db.update_user_fields(ctx.author, box=yud["box"])
+            await self.bot.db.update_user_fields(other, box=tud["box"])
             await ctx.send((await _(ctx, "Trade completed! Traded {} for {}!")).format(your_pokemon['name'], their_pokemon['name']))
 
         else:
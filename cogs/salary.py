@@ -1,7 +1,5 @@
-import datetime
-import asyncio
-import json
-from collections import defaultdict
+from time import monotonic
+from collections import defaultdict, Counter
 
 import discord
 from discord.ext import commands
@@ -12,70 +10,52 @@ from .utils.translation import _
 
 class Salary(object):
     """Salary commands"""
+    chunk_size = 1000  # Most members written per batch
 
     def __init__(self, bot):
         self.bot = bot
-        self.first = True
-
-    async def on_ready(self):
-        self.bot.loop.create_task(self.run_salaries())
-
-    async def run_salaries(self):
-        if self.first:
-            self.first = False
-            _today = datetime.datetime(*datetime.datetime.utcnow().timetuple()[:3])
-            time_until = (_today + datetime.timedelta(days=1)).timestamp() - datetime.datetime.utcnow().timestamp()
-            await asyncio.sleep(time_until)
-            while True:
-                try:
-                    dels = defaultdict(list)
-
-                    req = f"""SELECT UUID, info ->> 'salaries' FROM servdata;"""
-                    async with self.bot.db._conn.acquire() as connection:
-                        response = await connection.fetch(req)
-                    guilds = (y for y in ((x["uuid"], json.loads(x["?column?"])) for x in response if x["?column?"]) if
-                              y[1])
-
-                    for guild, roles in guilds:
-                        try:
-                            gob = self.bot.get_guild(guild)
-                            if gob:
-                                for role, amount in roles.items():
-                                    rob = discord.utils.get(gob.roles, id=int(role))
-                                    if rob:
-                                        for member in rob.members:
-                                            if isinstance(amount, (int, float)):
-                                                try:
-                                                    await self.bot.di.add_eco(member, amount)
-                                                except ValueError:
-                                                    await self.bot.di.set_eco(member, 0)
-                                            else:
-                                                payamount, giveamount = sum(
-                                                    filter(lambda x: isinstance(x, (int, float)), amount)), tuple(
-                                                    filter(
-                                                        lambda x: isinstance(x, (list, tuple)), amount))
-                                                if payamount:
-                                                    try:
-                                                        await self.bot.di.add_eco(member, payamount)
-                                                    except ValueError:
-                                                        await self.bot.di.set_eco(member, 0)
-                                                if giveamount:
-                                                    await self.bot.di.update_items(member, *giveamount)
-                                    else:
-                                        dels[gob].append((roles, role))
-                        except:
-                            pass
-                    try:
-                        for g, rs in dels.items():
-                            for allroles, r in rs:
-                                del allroles[r]
-                            await self.bot.di.update_salaries(g, allroles)
-                    except:
-                        pass
-                except:
-                    pass
-                finally:
-                    await asyncio.sleep(86400)
+        self.payout_stats = dict(guilds=0, members=0, seconds=0.0)
+
+    def payouts(self, guild, roles):
+        """Work out every salaried member's pay from all of their roles, grouping the members paid the same.
+        Returns ({(amount, items): [members]}, ids of roles that no longer exist)"""
+        pay = dict()
+        missing = []
+        for role, amount in roles.items():
+            rob = discord.utils.get(guild.roles, id=int(role))
+            if rob is None:
+                missing.append(role)
+                continue
+
+            payamount, giveamount = data.parse_salary(amount)
+            for member in rob.members:
+                total = pay.setdefault(member, [0, Counter()])
+                total[0] += payamount
+                total[1].update(dict(giveamount))
+
+        groups = defaultdict(list)
+        for member, (payamount, giveamount) in pay.items():
+            groups[(payamount, tuple(sorted(giveamount.items())))].append(member)
+        return groups, missing
+
+    async def pay(self, guild, roles):
+        """Pay a guild's salaries in batches, returning (number of members paid, ids of missing roles)"""
+        started = monotonic()
+        groups, missing = self.payouts(guild, roles)
+        paid = 0
+        for (payamount, giveamount), members in groups.items():
+            for i in range(0, len(members), self.chunk_size):
+                chunk = members[i:i + self.chunk_size]
+                await self.bot.di.pay_salary_many(chunk, payamount, giveamount)
+                paid += len(chunk)
+
+        if missing:
+            await self.bot.di.remove_salaries(guild, *missing)
+
+        self.payout_stats["guilds"] += 1
+        self.payout_stats["members"] += paid
+        self.payout_stats["seconds"] += monotonic() - started
+        return paid, missing
 
     @commands.command()
     @checks.no_pm()
@@ -115,7 +95,7 @@ class Salary(object):
     @checks.mod_or_permissions()
     async def create(self, ctx, role: discord.Role, *items_or_number: data.ItemOrNumber):
         """Create a daily salary for a user with the given role.
-         Roles are paid every day at 24:00, every user with the role will receive the amount specified.
+         Every user with the role earns the amount specified once a day, paid out when they next check or use their balance.
          If a role with a salary is deleted, the salary will also be deleted.
          For example
          `rp!salary create @Bot Creator 500` Will create a salary of $500 for a user daily
@@ -147,41 +127,23 @@ class Salary(object):
     @checks.mod_or_permissions()
     async def payout(self, ctx, role: discord.Role = None):
         """Manually pay out salaries for a role or all roles"""
-        dels = []
         roles = await self.bot.di.get_salaries(ctx.guild)
         try:
             if role is not None:
                 roles = {role.id: roles[str(role.id)]}
         except KeyError:
             await ctx.send(await _(ctx, "That role doesn't have a salary!"))
-        for role, amount in roles.items():
-            rob = discord.utils.get(ctx.guild.roles, id=int(role))
-            if rob:
-                for member in rob.members:
-                    if isinstance(amount, (int, float)):
-                        try:
-                            await self.bot.di.add_eco(member, amount)
-                        except ValueError:
-                            await self.bot.di.set_eco(member, 0)
-                    else:
-                        payamount, giveamount = sum(
-                            filter(lambda x: isinstance(x, (int, float)), amount)), tuple(filter(
-                            lambda x: isinstance(x, (list, tuple)), amount))
-                        if payamount:
-                            try:
-                                await self.bot.di.add_eco(member, payamount)
-                            except ValueError:
-                                await self.bot.di.set_eco(member, 0)
-                        if giveamount:
-                            await self.bot.di.update_items(member, *giveamount)
-            else:
-                dels.append(role)
-
+            return
+        paid, dels = await self.pay(ctx.guild, roles)
         if dels:
             await ctx.send((await _(ctx, "Roles {} were missing")).format(dels))
-            for role in dels:
-                del roles[role]
-
-            await self.bot.di.update_salaries(ctx.guild, roles)
 
         await ctx.send(await _(ctx, "Salaries payed out"))
+
+    @salary.command(hidden=True)
+    async def stats(self, ctx):
+        """See how fast manual salary payouts are being paid"""
+        stats = self.payout_stats
+        rate = stats["members"] / stats["seconds"] if stats["seconds"] else 0
+        await ctx.send('%s members of %s guilds paid out in %.2fs (%.0f members/s)' % (
+            stats["members"], stats["guilds"], stats["seconds"], rate))
@@ -105,9 +105,8 @@ class Settings(object):
         try:
             item = dict()
             item["name"] = name
-            check = lambda x: x.channel is ctx.channel and x.author is ctx.author
             await ctx.send(await _(ctx, "Describe the item (a description for the item)"))
-            response = await self.bot.wait_for("message", timeout=120, check=check)
+            response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=120)
             item["description"] = response.content
             item["meta"] = dict()
 
@@ -116,7 +115,7 @@ class Settings(object):
                              "Set an image for this item with the `image` key i.e. `image: http://image.com/image.png` "
                              "Set this item as usable by adding `used` key i.e. `used: You open the jar and the bird flies away`"))
             while True:
-                response = await self.bot.wait_for("message", timeout=60, check=check)
+                response = await self.bot.waiters.message(ctx.channel, ctx.author, timeout=60)
                 if response.content.lower() == "cancel":
                     await ctx.send(await _(ctx, "Cancelling!"))
                     return
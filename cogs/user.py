@@ -2,7 +2,7 @@ from discord.ext import commands
 import discord
 
 from .utils import checks, data
-from .utils.data import chain
+from .utils.data import chain, get_member
 from .utils.translation import _
 
 
@@ -24,7 +24,7 @@ class User(object):
         embed.set_thumbnail(url=user.avatar_url)
 
         ud = await self.bot.db.get_user_data(user)
-        gd = await self.bot.db.get_guild_data(ctx.guild)
+        gd = await self.bot.db.get_guild_settings(ctx.guild)
 
         pokemon = [f"{x[0]}: **{x[1]}**" for x in ud["box"]]
         pl = len(pokemon)
@@ -74,8 +74,7 @@ class User(object):
     async def setlevel(self, ctx, level: data.IntConverter, *members: data.MemberConverter):
         """Set the given members level"""
         members = chain(members)
-        for member in members:
-            await self.bot.di.set_level(member, level, 0)
+        await self.bot.di.set_level_many(members, level, 0)
         await ctx.send(await _(ctx, "Set level for members"))
 
     @checks.no_pm()
@@ -84,11 +83,23 @@ class User(object):
     async def add(self, ctx, amount: data.IntConverter, *members: data.MemberConverter):
         """Give the given members an amount of experience"""
         members = chain(members)
-        for member in members:
-            await self.bot.di.add_exp(member, amount)
+        await self.bot.di.add_exp_many(members, amount)
 
         await ctx.send(await _(ctx, "Gave experience to members"))
 
+    @checks.no_pm()
+    @experience.command(aliases=["leaderboard"])
+    async def top(self, ctx):
+        """Get the top 10 server levels"""
+        resp = await self.bot.db.get_leaderboard(ctx.guild, "level", 10,
+                                                 present=lambda user_id: get_member(ctx.guild, user_id))
+
+        users = [(get_member(ctx.guild, user_id), level, exp) for user_id, (level, exp) in resp]
+
+        fmt = await _(ctx, "Level {} ({} exp)")
+        msg = "\n".join(f"{x}: {y[0]} " + fmt.format(y[1], y[2]) for x, y in zip(range(1, 11), users))
+        await ctx.send(f"```\n{msg}\n```")
+
     @checks.no_pm()
     @experience.command()
     @checks.mod_or_permissions()
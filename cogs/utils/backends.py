@@ -0,0 +1,813 @@
+from collections import defaultdict
+from time import monotonic
+import asyncio
+import heapq
+import logging
+import os
+import ujson as json
+import asyncpg
+import copy
+
+from .data import default_user
+from .leaderboard import score
+
+DSN = dict(user='root', password='root', database='pokerpg', host='127.0.0.1')
+# Connection options for a read replica or hot standby to send read-only queries to, if there is one,
+# given as a connection URI in the RPGBOT_REPLICA_DSN environment variable
+REPLICA_DSN = dict(dsn=os.environ["RPGBOT_REPLICA_DSN"]) if os.environ.get("RPGBOT_REPLICA_DSN") else None
+
+# The per-server user fields, each stored in its own column of the members table
+USER_COLUMNS = ("money", "level", "exp", "items", "box", "guild", "settled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    user_id bigint NOT NULL,
+    guild_id bigint NOT NULL,
+    money double precision NOT NULL DEFAULT 0,
+    level integer NOT NULL DEFAULT 1,
+    exp integer NOT NULL DEFAULT 0,
+    items jsonb NOT NULL DEFAULT '{}',
+    box jsonb NOT NULL DEFAULT '[]',
+    guild text,
+    settled double precision,
+    version bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, guild_id)
+);
+ALTER TABLE members ADD COLUMN IF NOT EXISTS version bigint NOT NULL DEFAULT 0;
+ALTER TABLE members ADD COLUMN IF NOT EXISTS settled double precision;
+CREATE INDEX IF NOT EXISTS members_guild_id ON members (guild_id);
+CREATE INDEX IF NOT EXISTS members_guild_money ON members (guild_id, money DESC);
+CREATE INDEX IF NOT EXISTS members_guild_level ON members (guild_id, level DESC, exp DESC);
+CREATE TABLE IF NOT EXISTS guild_sections (
+    guild_id bigint NOT NULL,
+    section text NOT NULL,
+    data jsonb NOT NULL,
+    version bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, section)
+);
+ALTER TABLE guild_sections ADD COLUMN IF NOT EXISTS version bigint NOT NULL DEFAULT 0;
+CREATE TABLE IF NOT EXISTS migrations (
+    name text PRIMARY KEY,
+    position bigint NOT NULL DEFAULT 0,
+    done boolean NOT NULL DEFAULT false
+);
+CREATE TABLE IF NOT EXISTS scheduled_actions (
+    id text PRIMARY KEY,
+    worker integer NOT NULL,
+    due double precision NOT NULL,
+    name text NOT NULL,
+    args jsonb NOT NULL
+);
+"""
+
+# Load a guild's sections, creating them from $source if the guild has none. $4 limits the rows returned to one section
+GUILD_LOAD = """WITH source AS (
+        SELECT $source AS info
+    ), sections AS (
+        SELECT section, COALESCE(info -> section, '{}') AS data FROM source, unnest($3::text[]) section
+        UNION ALL SELECT 'settings', info - $3::text[] FROM source
+    ), created AS (
+        INSERT INTO guild_sections (guild_id, section, data)
+        SELECT $1::bigint, section, data FROM sections
+        WHERE NOT EXISTS(SELECT 1 FROM guild_sections WHERE guild_id = $1)
+        ON CONFLICT (guild_id, section) DO NOTHING RETURNING section, data, version
+    )
+    SELECT section, data::text, version FROM guild_sections
+    WHERE guild_id = $1 AND ($4::text IS NULL OR section = $4)
+    UNION ALL SELECT section, data::text, version FROM created WHERE $4::text IS NULL OR section = $4"""
+
+# Every query PostgresStorage issues. asyncpg prepares each the first time a pooled connection runs it and keeps
+# it in that connection's statement cache, later calls with the same text reuse it instead of being re-planned.
+# Create-or-update paths are single upserts so a first touch costs one round-trip.
+# Every write bumps the row's version, the conditional upserts only apply if it hasn't changed since it was read.
+STATEMENTS = {
+    "user_upsert": """INSERT INTO members (user_id, guild_id, money, level, exp, items, box, guild, settled)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        ON CONFLICT (user_id, guild_id) DO UPDATE SET money = EXCLUDED.money, level = EXCLUDED.level,
+        exp = EXCLUDED.exp, items = EXCLUDED.items, box = EXCLUDED.box, guild = EXCLUDED.guild,
+        settled = EXCLUDED.settled,
+        version = members.version + 1
+        RETURNING version""",
+    "user_conditional_upsert": """INSERT INTO members (user_id, guild_id, money, level, exp, items, box, guild, settled)
+        VALUES ($1, $2, $4, $5, $6, $7, $8, $9, $10)
+        ON CONFLICT (user_id, guild_id) DO UPDATE SET money = EXCLUDED.money, level = EXCLUDED.level,
+        exp = EXCLUDED.exp, items = EXCLUDED.items, box = EXCLUDED.box, guild = EXCLUDED.guild,
+        settled = EXCLUDED.settled,
+        version = members.version + 1
+        WHERE members.version = $3::bigint RETURNING version""",
+    "user_migrate": """INSERT INTO members (user_id, guild_id, money, level, exp, items, box, guild, settled)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9) ON CONFLICT (user_id, guild_id) DO NOTHING
+        RETURNING version""",
+    "user_select": """SELECT money, level, exp, items, box, guild, settled, version FROM members
+        WHERE user_id = $1 AND guild_id = $2""",
+    "users_select_many": """SELECT user_id, money, level, exp, items, box, guild, settled, version FROM members
+        WHERE guild_id = $1 AND user_id = ANY($2::bigint[])""",
+    "users_lock_many": """SELECT user_id, money, level, exp, items, box, guild, settled FROM members
+        WHERE guild_id = $1 AND user_id = ANY($2::bigint[]) FOR UPDATE""",
+    "user_full_select": """SELECT guild_id, money, level, exp, items, box, guild, settled FROM members
+        WHERE user_id = $1""",
+    "user_exists": """SELECT EXISTS(SELECT 1 FROM members WHERE user_id = $1)""",
+    "guild_top_money": """SELECT user_id, money FROM members WHERE guild_id = $1 ORDER BY money DESC LIMIT $2""",
+    "guild_top_level": """SELECT user_id, level, exp FROM members WHERE guild_id = $1
+        ORDER BY level DESC, exp DESC LIMIT $2""",
+    "migration_select": """SELECT position, done FROM migrations WHERE name = $1""",
+    "guild_load": GUILD_LOAD.replace("$source", "$2::jsonb"),
+    "guild_section_insert": """INSERT INTO guild_sections (guild_id, section, data) VALUES ($1, $2, $3)
+        ON CONFLICT (guild_id, section) DO NOTHING""",
+    "guild_section_upsert": """INSERT INTO guild_sections (guild_id, section, data) VALUES ($1, $2, $3)
+        ON CONFLICT (guild_id, section) DO UPDATE SET data = EXCLUDED.data, version = guild_sections.version + 1
+        RETURNING version""",
+    "guild_section_conditional_upsert": """INSERT INTO guild_sections (guild_id, section, data) VALUES ($1, $2, $4)
+        ON CONFLICT (guild_id, section) DO UPDATE SET data = EXCLUDED.data, version = guild_sections.version + 1
+        WHERE guild_sections.version = $3::bigint RETURNING version""",
+    "guild_sections_upsert": """INSERT INTO guild_sections (guild_id, section, data)
+        SELECT $1::bigint, * FROM unnest($2::text[], $3::jsonb[])
+        ON CONFLICT (guild_id, section) DO UPDATE SET data = EXCLUDED.data, version = guild_sections.version + 1
+        RETURNING section, version""",
+    "users_upsert_many": """INSERT INTO members (user_id, guild_id, money, level, exp, items, box, guild, settled)
+        SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::double precision[], $4::integer[], $5::integer[],
+            $6::jsonb[], $7::jsonb[], $8::text[], $9::double precision[])
+        ON CONFLICT (user_id, guild_id) DO UPDATE SET money = EXCLUDED.money, level = EXCLUDED.level,
+        exp = EXCLUDED.exp, items = EXCLUDED.items, box = EXCLUDED.box, guild = EXCLUDED.guild,
+        settled = EXCLUDED.settled,
+        version = members.version + 1
+        RETURNING user_id, version""",
+    "guild_sections_upsert_many": """INSERT INTO guild_sections (guild_id, section, data)
+        SELECT * FROM unnest($1::bigint[], $2::text[], $3::jsonb[])
+        ON CONFLICT (guild_id, section) DO UPDATE SET data = EXCLUDED.data, version = guild_sections.version + 1""",
+    "guild_settings_update": """INSERT INTO guild_sections (guild_id, section, data) VALUES ($1, 'settings', $2)
+        ON CONFLICT (guild_id, section) DO UPDATE SET data = guild_sections.data || EXCLUDED.data,
+        version = guild_sections.version + 1
+        RETURNING data::text, version""",
+    "guild_sections_select": """SELECT section, data::text, version FROM guild_sections WHERE guild_id = $1""",
+    "notify": """SELECT pg_notify($1, $2)""",
+    "action_insert": """INSERT INTO scheduled_actions (id, worker, due, name, args) VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (id) DO UPDATE SET due = EXCLUDED.due, args = EXCLUDED.args""",
+    "action_delete": """DELETE FROM scheduled_actions WHERE id = $1""",
+    "actions_select": """SELECT id, due, name, args FROM scheduled_actions WHERE worker = $1""",
+}
+
+# Queries against the old userdata/servdata blobs, only used until `cogs.utils.migrate` has finished.
+LEGACY_STATEMENTS = {
+    "user_load": """WITH legacy AS (
+            SELECT info -> $3::text AS data FROM userdata
+            WHERE UUID = $1 AND NOT EXISTS(SELECT 1 FROM members WHERE user_id = $1 AND guild_id = $2)
+        ), created AS (
+            INSERT INTO members (user_id, guild_id, money, level, exp, items, box, guild, settled)
+            SELECT $1::bigint, $2::bigint, COALESCE((data ->> 'money')::double precision, 0),
+                COALESCE((data ->> 'level')::numeric::integer, 1), COALESCE((data ->> 'exp')::numeric::integer, 0),
+                COALESCE(data -> 'items', '{}'), COALESCE(data -> 'box', '[]'), data ->> 'guild',
+                (data ->> 'settled')::double precision
+            FROM legacy WHERE jsonb_typeof(data) = 'object'
+            ON CONFLICT (user_id, guild_id) DO NOTHING RETURNING money, level, exp, items, box, guild, settled, version
+        )
+        SELECT money, level, exp, items, box, guild, settled, version FROM members WHERE user_id = $1 AND guild_id = $2
+        UNION ALL SELECT * FROM created""",
+    "user_full_select": """SELECT info FROM userdata WHERE UUID = $1""",
+    "guild_load": GUILD_LOAD.replace("$source", "COALESCE((SELECT info FROM servdata WHERE UUID = $1), $2::jsonb)"),
+    "guild_select": """SELECT info FROM servdata WHERE UUID = $1""",
+}
+
+# Queries for the web API's bot and account tables, which aren't managed here
+API_STATEMENTS = {
+    "botdata_select": """SELECT * FROM botdata WHERE id = $1""",
+    "bot_name": """SELECT name FROM botdata WHERE id = $1""",
+    "bot_url": """SELECT url FROM botdata WHERE name = $1""",
+    "api_user_select": """SELECT * FROM userdata WHERE user_id = $1""",
+    "api_user_by_token": """SELECT * FROM userdata WHERE token = $1""",
+    "api_user_insert": """INSERT INTO userdata VALUES ($1, ARRAY[]::bigint[], $2, 0)""",
+}
+
+# The parts of a guild's data stored in their own guild_sections row, everything else is kept in "settings"
+GUILD_SECTIONS = ("items", "characters", "market_items", "shop_items", "lootboxes", "guilds", "recipes",
+                  "salaries", "maps")
+
+
+def user_fields_statement(fields):
+    """Build the upsert setting only the given user columns, new rows take the column defaults for the rest"""
+    names = ", ".join(fields)
+    values = ", ".join(f"${i}" for i, _ in enumerate(fields, 3))
+    columns = ", ".join(f"{field} = EXCLUDED.{field}" for field in fields)
+    return f"""INSERT INTO members (user_id, guild_id, {names}) VALUES ($1, $2, {values})
+        ON CONFLICT (user_id, guild_id) DO UPDATE SET {columns}, version = members.version + 1
+        RETURNING money, level, exp, items, box, guild, settled, version"""
+
+
+def split_guild_data(data):
+    """Split a guild's data into its sections"""
+    sections = dict(settings={k: v for k, v in data.items() if k not in GUILD_SECTIONS})
+    for section in GUILD_SECTIONS:
+        sections[section] = data.get(section) or {}
+    return sections
+
+
+def user_columns(data, default):
+    """Get the column values for a user's server data, filling in missing fields"""
+    return tuple(default[c] if data.get(c) is None and c != "guild" else data.get(c) for c in USER_COLUMNS)
+
+
+class VersionConflict(Exception):
+    """A record kept changing under a mutation, even after retrying it"""
+
+
+class Storage(object):
+    """Every query the bot makes against its data store.
+    User records are a user's data for one server keyed by (user id, guild id), guild sections are keyed by
+    (guild id, section). Every write bumps a record's version, which starts at 0; missing users have version None."""
+    # Whether data may still only exist in the old userdata/servdata blobs, see `cogs.utils.migrate`
+    legacy_users = False
+    legacy_guilds = False
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def wrote(self, users=(), guilds=()):
+        """Note that records were written, by this or another worker"""
+        pass
+
+    async def get_user(self, user_id, guild_id, primary=False):
+        """Get (data, version) of a user's server data, data is None if there is none.
+        Passing primary skips any replica, for reads that are about to be written back."""
+        raise NotImplementedError
+
+    async def get_users(self, guild_id, user_ids, primary=False):
+        """Get {user id: (data, version)} for the given users of a server that have data, primary like `get_user`"""
+        raise NotImplementedError
+
+    async def get_user_guilds(self, user_id):
+        """Get a user's data for every server, keyed by the server id as a string"""
+        raise NotImplementedError
+
+    async def user_exists(self, user_id):
+        raise NotImplementedError
+
+    async def put_user(self, user_id, guild_id, data):
+        """Create or replace a user's server data, returning its new version"""
+        raise NotImplementedError
+
+    async def add_user(self, user_id, guild_id, data):
+        """Create a user's server data if there is none, returning its version or None if it already existed"""
+        raise NotImplementedError
+
+    async def update_user_fields(self, user_id, guild_id, fields):
+        """Update only the given fields of a user's server data, returning the full (data, version)"""
+        raise NotImplementedError
+
+    async def mutate_users(self, guild_id, user_ids, mutate):
+        """Apply mutate(user id, data) to many users' server data and save them all at once, locking them in between.
+        Returns {user id: (data, version, what mutate returned)}, nothing is saved if any call raises."""
+        raise NotImplementedError
+
+    async def get_top(self, guild_id, board, limit):
+        """Get the best (user id, score) pairs of a server's leaderboard, see `cogs.utils.leaderboard`"""
+        raise NotImplementedError
+
+    async def load_guild(self, guild_id, default, section=None):
+        """Get {section: (encoded data, version)} for a guild's sections, or only the given one,
+        creating them from `default` if the guild has none"""
+        raise NotImplementedError
+
+    async def get_guild(self, guild_id):
+        """Get {section: (encoded data, version)} for a guild's sections without creating them, empty if it has none"""
+        raise NotImplementedError
+
+    async def put_section(self, guild_id, section, data):
+        """Replace a guild section, returning its new version"""
+        raise NotImplementedError
+
+    async def put_sections(self, guild_id, sections):
+        """Replace several of a guild's sections, returning {section: new version}"""
+        raise NotImplementedError
+
+    async def update_settings(self, guild_id, settings):
+        """Merge the given settings into a guild's settings, returning the (encoded settings, version)"""
+        raise NotImplementedError
+
+    async def write_many(self, users, sections):
+        """Replace many user records and guild sections at once,
+        given as {(user id, guild id): data} and {(guild id, section): data}"""
+        raise NotImplementedError
+
+    async def write_conditional(self, users, sections):
+        """Replace user records and guild sections all at once, given as {key: (data, version read)}.
+        Returns {key: new version}, or None without writing anything if any of them changed since."""
+        raise NotImplementedError
+
+    async def get_botdata(self, bot_id):
+        """Get the web API's rows for a bot"""
+        raise NotImplementedError
+
+    async def get_bot_name(self, bot_id):
+        raise NotImplementedError
+
+    async def get_bot_url(self, name):
+        raise NotImplementedError
+
+    async def get_api_user(self, user_id=None, token=None):
+        """Get a web API account by its user id or token, or None"""
+        raise NotImplementedError
+
+    async def add_api_user(self, user_id, token):
+        raise NotImplementedError
+
+    async def listen(self, channel, callback, lost=None):
+        """Call callback(payload) for every notification sent on a channel by any process using this store.
+        lost() is called when notifications may have been missed, when the connection drops and again
+        once it's back"""
+        raise NotImplementedError
+
+    async def notify(self, channel, payload):
+        raise NotImplementedError
+
+    async def save_action(self, id, worker, due, name, args):
+        """Keep a scheduled action until it's deleted, so it can be scheduled again after a restart"""
+        raise NotImplementedError
+
+    async def delete_action(self, id):
+        raise NotImplementedError
+
+    async def load_actions(self, worker):
+        """Get (id, due, name, args) for every saved action of a worker"""
+        raise NotImplementedError
+
+
+class PostgresStorage(Storage):
+    """Keeps everything in Postgres. Given a replica, read-only queries go to it unless the records they read
+    were written in the last replica_lag seconds, by this worker or another one it heard from over the bus.
+    This is only a best-effort time window: a replica lagging further behind than replica_lag serves stale data."""
+
+    def __init__(self, dsn=DSN, replica_dsn=REPLICA_DSN, replica_lag=10.0):
+        self.dsn = dsn
+        self.replica_dsn = replica_dsn
+        self.replica_lag = replica_lag
+        self.pool = None
+        self.replica = None
+        self.listener = None  # Notifications need a connection of their own, outside the pool
+        self.channels = dict()  # channel: (callback, lost)
+        self.closing = False
+        self.legacy_users = True
+        self.legacy_guilds = True
+        # When records were last written, only kept while there's a replica to route around
+        self.written_users = dict()
+        self.written_guilds = dict()
+        self.pruned = monotonic()
+
+    @staticmethod
+    async def init_connection(connection):
+        """Register the json codecs on a new pooled connection"""
+        for type in ("json", "jsonb"):
+            await connection.set_type_codec(type, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+    def wrote(self, users=(), guilds=()):
+        """Note that records were written, so reads of them skip the replica until it has caught up.
+        `Database` also calls this for other workers' writes it hears about over the bus."""
+        if self.replica is None:
+            return
+        now = monotonic()
+        for user_id in users:
+            self.written_users[user_id] = now
+        for guild_id in guilds:
+            self.written_guilds[guild_id] = now
+
+        if now - self.pruned > self.replica_lag:
+            self.pruned = now
+            for written in (self.written_users, self.written_guilds):
+                for key in [key for key, when in written.items() if now - when > self.replica_lag]:
+                    del written[key]
+
+    def reader(self, users=(), guilds=()):
+        """Get the pool to read records from, the primary if any of them were written too recently to be on
+        the replica"""
+        if self.replica is None:
+            return self.pool
+        now = monotonic()
+        for user_id in users:
+            if now - self.written_users.get(user_id, now - self.replica_lag) < self.replica_lag:
+                return self.pool
+        for guild_id in guilds:
+            if now - self.written_guilds.get(guild_id, now - self.replica_lag) < self.replica_lag:
+                return self.pool
+        return self.replica
+
+    async def connect(self):
+        connection = await asyncpg.connect(**self.dsn)
+        try:
+            await connection.execute(SCHEMA)
+        finally:
+            await connection.close()
+        self.pool = await asyncpg.create_pool(**self.dsn, init=self.init_connection)
+        migration = await self.pool.fetchrow(STATEMENTS["migration_select"], "members")
+        self.legacy_users = not (migration and migration["done"])
+        migration = await self.pool.fetchrow(STATEMENTS["migration_select"], "guild_sections")
+        self.legacy_guilds = not (migration and migration["done"])
+        if self.replica_dsn is not None:
+            self.replica = await asyncpg.create_pool(**self.replica_dsn, init=self.init_connection)
+
+    async def close(self):
+        self.closing = True
+        if self.listener is not None:
+            await self.listener.close()
+        if self.replica is not None:
+            await self.replica.close()
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def fetchval(self, statement, *args, pool=None):
+        """Run one of our statements, on the primary unless given another pool"""
+        async with (pool or self.pool).acquire() as connection:
+            return await connection.fetchval(STATEMENTS[statement], *args)
+
+    async def fetchrow(self, statement, *args, pool=None):
+        async with (pool or self.pool).acquire() as connection:
+            return await connection.fetchrow(STATEMENTS[statement], *args)
+
+    async def fetch(self, statement, *args, pool=None):
+        async with (pool or self.pool).acquire() as connection:
+            return await connection.fetch(STATEMENTS[statement], *args)
+
+    async def get_user(self, user_id, guild_id, primary=False):
+        if self.legacy_users:
+            # Copies the user's old blob across on first touch
+            async with self.pool.acquire() as connection:
+                row = await connection.fetchrow(LEGACY_STATEMENTS["user_load"], user_id, guild_id, str(guild_id))
+        else:
+            pool = self.pool if primary else self.reader([user_id], [guild_id])
+            row = await self.fetchrow("user_select", user_id, guild_id, pool=pool)
+        if row is None:
+            return None, None
+        data = dict(row)
+        return data, data.pop("version")
+
+    async def get_users(self, guild_id, user_ids, primary=False):
+        rows = await self.fetch("users_select_many", guild_id, user_ids,
+                                pool=self.pool if primary else self.reader(guilds=[guild_id]))
+        users = dict()
+        for row in rows:
+            data = dict(row)
+            users[data.pop("user_id")] = data, data.pop("version")
+        return users
+
+    async def get_user_guilds(self, user_id):
+        data = dict()
+        async with self.reader([user_id]).acquire() as connection:
+            if self.legacy_users:
+                data.update(await connection.fetchval(LEGACY_STATEMENTS["user_full_select"], user_id) or {})
+            for row in await connection.fetch(STATEMENTS["user_full_select"], user_id):
+                data[str(row["guild_id"])] = {c: row[c] for c in USER_COLUMNS}
+        return data
+
+    async def user_exists(self, user_id):
+        return await self.fetchval("user_exists", user_id, pool=self.reader([user_id]))
+
+    async def put_user(self, user_id, guild_id, data):
+        version = await self.fetchval("user_upsert", user_id, guild_id, *user_columns(data, default_user))
+        self.wrote([user_id], [guild_id])
+        return version
+
+    async def add_user(self, user_id, guild_id, data):
+        version = await self.fetchval("user_migrate", user_id, guild_id, *user_columns(data, default_user))
+        self.wrote([user_id], [guild_id])
+        return version
+
+    async def update_user_fields(self, user_id, guild_id, fields):
+        async with self.pool.acquire() as connection:
+            row = await connection.fetchrow(user_fields_statement(tuple(fields)), user_id, guild_id,
+                                            *fields.values())
+        self.wrote([user_id], [guild_id])
+        data = dict(row)
+        return data, data.pop("version")
+
+    async def mutate_users(self, guild_id, user_ids, mutate):
+        users = dict()
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                rows = await connection.fetch(STATEMENTS["users_lock_many"], guild_id, user_ids)
+                found = {row["user_id"]: row for row in rows}
+                for user_id in user_ids:
+                    if user_id in found:
+                        data = {c: found[user_id][c] for c in USER_COLUMNS}
+                    else:
+                        data = copy.deepcopy(default_user)
+                    users[user_id] = data, mutate(user_id, data)
+
+                columns = zip(*(user_columns(data, default_user) for data, _ in users.values()))
+                rows = await connection.fetch(STATEMENTS["users_upsert_many"], list(users), [guild_id] * len(users),
+                                              *map(list, columns))
+        self.wrote(users, [guild_id])
+        versions = {row["user_id"]: row["version"] for row in rows}
+        return {user_id: (data, versions[user_id], result) for user_id, (data, result) in users.items()}
+
+    async def get_top(self, guild_id, board, limit):
+        rows = await self.fetch(f"guild_top_{board}", guild_id, limit, pool=self.reader(guilds=[guild_id]))
+        return [(row[0], tuple(row[1:])) for row in rows]
+
+    async def load_guild(self, guild_id, default, section=None):
+        statements = LEGACY_STATEMENTS if self.legacy_guilds else STATEMENTS
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch(statements["guild_load"], guild_id, default, GUILD_SECTIONS, section)
+        self.wrote(guilds=[guild_id])
+        return {row["section"]: (row["data"], row["version"]) for row in rows}
+
+    async def get_guild(self, guild_id):
+        async with self.reader(guilds=[guild_id]).acquire() as connection:
+            rows = await connection.fetch(STATEMENTS["guild_sections_select"], guild_id)
+            if not rows and self.legacy_guilds:
+                data = await connection.fetchval(LEGACY_STATEMENTS["guild_select"], guild_id)
+                if data is not None:
+                    return {name: (json.dumps(value), None) for name, value in split_guild_data(data).items()}
+        return {row["section"]: (row["data"], row["version"]) for row in rows}
+
+    async def put_section(self, guild_id, section, data):
+        version = await self.fetchval("guild_section_upsert", guild_id, section, data)
+        self.wrote(guilds=[guild_id])
+        return version
+
+    async def put_sections(self, guild_id, sections):
+        rows = await self.fetch("guild_sections_upsert", guild_id, list(sections), list(sections.values()))
+        self.wrote(guilds=[guild_id])
+        return {row["section"]: row["version"] for row in rows}
+
+    async def update_settings(self, guild_id, settings):
+        row = await self.fetchrow("guild_settings_update", guild_id, settings)
+        self.wrote(guilds=[guild_id])
+        return row["data"], row["version"]
+
+    async def write_many(self, users, sections):
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                if users:
+                    columns = zip(*(user_columns(data, default_user) for data in users.values()))
+                    await connection.execute(STATEMENTS["users_upsert_many"], [k[0] for k in users],
+                                             [k[1] for k in users], *map(list, columns))
+                if sections:
+                    await connection.execute(STATEMENTS["guild_sections_upsert_many"], [k[0] for k in sections],
+                                             [k[1] for k in sections], list(sections.values()))
+        self.wrote([k[0] for k in users], [k[1] for k in users] + [k[0] for k in sections])
+
+    @staticmethod
+    async def write_records(connection, users, sections):
+        versions = dict()
+        for key, (data, version) in users.items():
+            versions[key] = await connection.fetchval(STATEMENTS["user_conditional_upsert"], *key, version,
+                                                      *user_columns(data, default_user))
+            if versions[key] is None:
+                raise VersionConflict(f"User {key[0]} in {key[1]} changed")
+        for key, (data, version) in sections.items():
+            versions[key] = await connection.fetchval(STATEMENTS["guild_section_conditional_upsert"], *key,
+                                                      version, data)
+            if versions[key] is None:
+                raise VersionConflict(f"Section {key[1]} of {key[0]} changed")
+        return versions
+
+    async def write_conditional(self, users, sections):
+        try:
+            async with self.pool.acquire() as connection:
+                if len(users) + len(sections) == 1:
+                    versions = await self.write_records(connection, users, sections)
+                else:
+                    async with connection.transaction():
+                        versions = await self.write_records(connection, users, sections)
+        except VersionConflict:
+            return None
+        self.wrote([k[0] for k in users], [k[1] for k in users] + [k[0] for k in sections])
+        return versions
+
+    async def get_botdata(self, bot_id):
+        async with self.reader().acquire() as connection:
+            return await connection.fetch(API_STATEMENTS["botdata_select"], bot_id)
+
+    async def get_bot_name(self, bot_id):
+        async with self.reader().acquire() as connection:
+            return await connection.fetchval(API_STATEMENTS["bot_name"], bot_id)
+
+    async def get_bot_url(self, name):
+        async with self.reader().acquire() as connection:
+            return await connection.fetchval(API_STATEMENTS["bot_url"], name)
+
+    async def get_api_user(self, user_id=None, token=None):
+        # Accounts looked up by token were made at least a login ago, the replica has them
+        async with self.reader([] if user_id is None else [user_id]).acquire() as connection:
+            if token is not None:
+                return await connection.fetchrow(API_STATEMENTS["api_user_by_token"], token)
+            return await connection.fetchrow(API_STATEMENTS["api_user_select"], user_id)
+
+    async def add_api_user(self, user_id, token):
+        async with self.pool.acquire() as connection:
+            await connection.execute(API_STATEMENTS["api_user_insert"], user_id, token)
+        self.wrote([user_id])
+
+    async def listen(self, channel, callback, lost=None):
+        self.channels[channel] = (callback, lost)
+        if self.listener is None:
+            await self.connect_listener()
+        else:
+            await self.listener.add_listener(channel, self.relay(callback))
+
+    @staticmethod
+    def relay(callback):
+        return lambda connection, pid, channel, payload: callback(payload)
+
+    async def connect_listener(self):
+        listener = await asyncpg.connect(**self.dsn)
+        for channel, (callback, lost) in self.channels.items():
+            await listener.add_listener(channel, self.relay(callback))
+        listener.add_termination_listener(self.listener_lost)
+        self.listener = listener
+
+    def listener_lost(self, connection):
+        if connection is not self.listener or self.closing:
+            return
+        self.listener = None
+        logging.warning("Lost the notification connection, reconnecting")
+        self.listener_missed()
+        asyncio.get_event_loop().create_task(self.reconnect_listener())
+
+    def listener_missed(self):
+        for callback, lost in self.channels.values():
+            if lost is not None:
+                lost()
+
+    async def reconnect_listener(self):
+        delay = 1
+        while self.listener is None and not self.closing:
+            try:
+                await self.connect_listener()
+            except (OSError, asyncpg.PostgresError):
+                logging.exception("Failed to reconnect the notification connection")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+        if not self.closing:
+            logging.info("Notification connection restored")
+            # Anything sent while it was down was missed
+            self.listener_missed()
+
+    async def notify(self, channel, payload):
+        await self.fetchval("notify", channel, payload)
+
+    async def save_action(self, id, worker, due, name, args):
+        await self.fetchval("action_insert", id, worker, due, name, args)
+
+    async def delete_action(self, id):
+        await self.fetchval("action_delete", id)
+
+    async def load_actions(self, worker):
+        return [tuple(row) for row in await self.fetch("actions_select", worker)]
+
+
+class MemoryStorage(Storage):
+    """Keeps everything in the bot's process, for running without a database server and for benchmarks.
+    Nothing is saved when the bot stops. Records are stored encoded, so callers never share them."""
+
+    def __init__(self):
+        self.users = dict()  # (user id, guild id): (encoded data, version)
+        self.sections = dict()  # (guild id, section): (encoded data, version)
+        self.user_guilds = defaultdict(set)
+        self.guild_users = defaultdict(set)
+        self.bots = dict()
+        self.api_users = dict()
+        self.listeners = defaultdict(list)
+        self.actions = dict()  # id: (worker, due, name, args)
+
+    async def get_user(self, user_id, guild_id, primary=False):
+        response, version = self.users.get((user_id, guild_id), ("null", None))
+        return json.loads(response), version
+
+    async def get_users(self, guild_id, user_ids, primary=False):
+        users = dict()
+        for user_id in user_ids:
+            response, version = self.users.get((user_id, guild_id), (None, None))
+            if response is not None:
+                users[user_id] = json.loads(response), version
+        return users
+
+    async def get_user_guilds(self, user_id):
+        return {str(guild_id): json.loads(self.users[(user_id, guild_id)][0])
+                for guild_id in self.user_guilds.get(user_id, ())}
+
+    async def user_exists(self, user_id):
+        return bool(self.user_guilds.get(user_id))
+
+    def store_user(self, user_id, guild_id, data):
+        data = dict(zip(USER_COLUMNS, user_columns(data, default_user)))
+        _, version = self.users.get((user_id, guild_id), (None, -1))
+        self.users[(user_id, guild_id)] = json.dumps(data), version + 1
+        self.user_guilds[user_id].add(guild_id)
+        self.guild_users[guild_id].add(user_id)
+        return version + 1
+
+    def store_section(self, guild_id, section, data):
+        _, version = self.sections.get((guild_id, section), (None, -1))
+        self.sections[(guild_id, section)] = json.dumps(data), version + 1
+        return version + 1
+
+    async def put_user(self, user_id, guild_id, data):
+        return self.store_user(user_id, guild_id, data)
+
+    async def add_user(self, user_id, guild_id, data):
+        if (user_id, guild_id) not in self.users:
+            return self.store_user(user_id, guild_id, data)
+
+    async def update_user_fields(self, user_id, guild_id, fields):
+        data, _ = await self.get_user(user_id, guild_id)
+        data = data or copy.deepcopy(default_user)
+        data.update(fields)
+        return data, self.store_user(user_id, guild_id, data)
+
+    async def get_top(self, guild_id, board, limit):
+        scores = ((user_id, score(board, json.loads(self.users[(user_id, guild_id)][0])))
+                  for user_id in self.guild_users.get(guild_id, ()))
+        return heapq.nlargest(limit, scores, key=lambda x: x[1])
+
+    async def load_guild(self, guild_id, default, section=None):
+        if (guild_id, "settings") not in self.sections:
+            for name, data in split_guild_data(default).items():
+                if (guild_id, name) not in self.sections:
+                    self.store_section(guild_id, name, data)
+        names = GUILD_SECTIONS + ("settings",) if section is None else (section,)
+        return {name: self.sections[(guild_id, name)] for name in names if (guild_id, name) in self.sections}
+
+    async def get_guild(self, guild_id):
+        return {name: self.sections[(guild_id, name)] for name in GUILD_SECTIONS + ("settings",)
+                if (guild_id, name) in self.sections}
+
+    async def put_section(self, guild_id, section, data):
+        return self.store_section(guild_id, section, data)
+
+    async def put_sections(self, guild_id, sections):
+        return {section: self.store_section(guild_id, section, data) for section, data in sections.items()}
+
+    async def update_settings(self, guild_id, settings):
+        data = json.loads(self.sections.get((guild_id, "settings"), ("{}", None))[0])
+        data.update(settings)
+        self.store_section(guild_id, "settings", data)
+        return self.sections[(guild_id, "settings")]
+
+    async def mutate_users(self, guild_id, user_ids, mutate):
+        users = dict()
+        for user_id in user_ids:
+            response, _ = self.users.get((user_id, guild_id), (None, None))
+            data = json.loads(response) if response is not None else copy.deepcopy(default_user)
+            users[user_id] = data, mutate(user_id, data)
+        return {user_id: (data, self.store_user(user_id, guild_id, data), result)
+                for user_id, (data, result) in users.items()}
+
+    async def write_many(self, users, sections):
+        for key, data in users.items():
+            self.store_user(*key, data)
+        for key, data in sections.items():
+            self.store_section(*key, data)
+
+    async def write_conditional(self, users, sections):
+        for key, (data, version) in users.items():
+            if self.users.get(key, (None, None))[1] != version:
+                return None
+        for key, (data, version) in sections.items():
+            if self.sections.get(key, (None, None))[1] != version:
+                return None
+
+        versions = {key: self.store_user(*key, data) for key, (data, _) in users.items()}
+        versions.update({key: self.store_section(*key, data) for key, (data, _) in sections.items()})
+        return versions
+
+    async def get_botdata(self, bot_id):
+        return [self.bots[bot_id]] if bot_id in self.bots else []
+
+    async def get_bot_name(self, bot_id):
+        return self.bots.get(bot_id, {}).get("name")
+
+    async def get_bot_url(self, name):
+        for bot in self.bots.values():
+            if bot["name"] == name:
+                return bot["url"]
+
+    async def get_api_user(self, user_id=None, token=None):
+        if token is not None:
+            for user in self.api_users.values():
+                if user["token"] == token:
+                    return user
+            return None
+        return self.api_users.get(user_id)
+
+    async def add_api_user(self, user_id, token):
+        self.api_users[user_id] = dict(user_id=user_id, bots=[], token=token, type=0)
+
+    async def listen(self, channel, callback, lost=None):
+        # Nothing is shared between processes, so only this process can be listening
+        self.listeners[channel].append(callback)
+
+    async def notify(self, channel, payload):
+        for callback in self.listeners[channel]:
+            callback(payload)
+
+    async def save_action(self, id, worker, due, name, args):
+        self.actions[id] = (worker, due, name, copy.deepcopy(args))
+
+    async def delete_action(self, id):
+        self.actions.pop(id, None)
+
+    async def load_actions(self, worker):
+        return [(id, due, name, copy.deepcopy(args)) for id, (w, due, name, args) in self.actions.items()
+                if w == worker]
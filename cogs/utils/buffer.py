@@ -0,0 +1,112 @@
+from time import monotonic
+import asyncio
+import logging
+
+
+class WriteBuffer(object):
+    """Holds dirty user records and guild sections in memory, coalescing repeated writes to the same record
+    and writing them to the database in batches"""
+
+    def __init__(self, db, interval=0.5, max_size=500, max_staleness=5.0):
+        self.db = db
+        self.interval = interval  # Seconds between flushes
+        self.max_size = max_size  # Number of dirty records that triggers an early flush
+        self.max_staleness = max_staleness  # Seconds a write may wait before writers have to wait for a flush
+        self.users = dict()
+        self.sections = dict()
+        self._flushing = (dict(), dict())  # Records being written by the current flush
+        self.since = None
+        self.flushes = 0
+        self.written = 0
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def __len__(self):
+        return len(self.users) + len(self.sections)
+
+    def start(self, loop):
+        self._task = loop.create_task(self.run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Failed to flush the write buffer, retrying next interval")
+
+    def get_user(self, user_id, guild_id):
+        """Get a dirty user record that hasn't been written yet, or None"""
+        key = (user_id, guild_id)
+        return self.users.get(key, self._flushing[0].get(key))
+
+    def get_section(self, guild_id, section):
+        """Get a dirty guild section that hasn't been written yet, or None"""
+        key = (guild_id, section)
+        return self.sections.get(key, self._flushing[1].get(key))
+
+    async def stage(self, records, key, value):
+        records[key] = value
+        await self.staged()
+
+    async def staged(self):
+        if self.since is None:
+            self.since = monotonic()
+        elif monotonic() - self.since > self.max_staleness:
+            await self.flush()
+            return
+        if len(self) >= self.max_size:
+            self._wakeup.set()
+
+    async def stage_user(self, user_id, guild_id, data):
+        """Mark a user's server data as dirty"""
+        await self.stage(self.users, (user_id, guild_id), data)
+
+    async def stage_section(self, guild_id, section, data):
+        """Mark a guild section as dirty"""
+        await self.stage(self.sections, (guild_id, section), data)
+
+    async def stage_many(self, users, sections):
+        """Mark many user records and guild sections as dirty at once, so they're always flushed together"""
+        self.users.update(users)
+        self.sections.update(sections)
+        await self.staged()
+
+    async def flush(self):
+        """Write every dirty record in a single transaction"""
+        async with self._lock:
+            if not len(self):
+                return
+            users, self.users = self.users, dict()
+            sections, self.sections = self.sections, dict()
+            since, self.since = self.since, None
+            self._flushing = (users, sections)
+            try:
+                await self.db.write_many(users, sections)
+            except Exception:
+                # Keep anything that hasn't been written again since for the next flush
+                for key, value in users.items():
+                    self.users.setdefault(key, value)
+                for key, value in sections.items():
+                    self.sections.setdefault(key, value)
+                self.since = since
+                raise
+            finally:
+                self._flushing = (dict(), dict())
+
+            self.flushes += 1
+            self.written += len(users) + len(sections)
+
+    def stats(self):
+        return dict(pending=len(self), flushes=self.flushes, written=self.written)
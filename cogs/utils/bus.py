@@ -0,0 +1,114 @@
+from collections import defaultdict
+import ujson as json
+import asyncio
+import logging
+
+
+class Bus(object):
+    """Carries events between the worker processes of a cluster, see `cluster.py`.
+    Published events are batched and sent through the storage's notification channel every interval,
+    each other worker then calls the handlers subscribed to the event's type."""
+    channel = "rpgbot_events"
+    max_payload = 7000  # Postgres notifications are limited to 8000 bytes
+
+    def __init__(self, bot, worker=0, interval=0.1):
+        self.bot = bot
+        self.worker = worker
+        self.interval = interval
+        self.handlers = defaultdict(list)
+        self.outgoing = []
+        self._task = None
+
+    def subscribe(self, type, handler):
+        """Call handler(event) for every event of this type published by another worker.
+        Handlers of "missed" are called with no arguments instead, whenever events may have been lost"""
+        self.handlers[type].append(handler)
+
+    def publish(self, type, **event):
+        event["type"] = type
+        self.outgoing.append(event)
+
+    async def start(self):
+        await self.bot.db.storage.listen(self.channel, self.received, self.missed)
+        self._task = self.bot.loop.create_task(self.run())
+
+    async def close(self):
+        """Stop the periodic sends and send anything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Failed to send cluster events")
+
+    async def flush(self):
+        events, self.outgoing = self.outgoing, []
+        parts = []  # (event, encoded)
+        for event in events:
+            parts.extend(self.encode(event))
+
+        start = 0
+        size = 0
+        for i, (event, encoded) in enumerate(parts):
+            if i > start and size + len(encoded) > self.max_payload:
+                await self.send_parts(parts, start, i)
+                start, size = i, 0
+            size += len(encoded) + 1
+        if start < len(parts):
+            await self.send_parts(parts, start, len(parts))
+
+    async def send_parts(self, parts, start, end):
+        try:
+            await self.send([encoded for event, encoded in parts[start:end]])
+        except Exception:
+            # Queue everything not sent yet to go out first next time
+            self.outgoing[:0] = [event for event, encoded in parts[start:]]
+            raise
+
+    def encode(self, event):
+        """Encode an event as [(event, encoded)], split into several events if it's too big for one notification.
+        An event's lists are taken to be independent items, like the keys of an invalidate event,
+        and the longest is split in half until each part fits."""
+        encoded = json.dumps(event)
+        if len(encoded) <= self.max_payload:
+            return [(event, encoded)]
+        lists = [key for key, value in event.items() if isinstance(value, list) and len(value) > 1]
+        if not lists:
+            logging.error(f"Dropped a {event['type']} cluster event too big to send")
+            return []
+        key = max(lists, key=lambda key: len(event[key]))
+        half = len(event[key]) // 2
+        first = dict(event)
+        first[key] = event[key][:half]
+        second = {name: [] if isinstance(value, list) else value for name, value in event.items()}
+        second[key] = event[key][half:]
+        return self.encode(first) + self.encode(second)
+
+    async def send(self, batch):
+        payload = '{"worker": %d, "events": [%s]}' % (self.worker, ",".join(batch))
+        await self.bot.db.storage.notify(self.channel, payload)
+
+    def missed(self):
+        """Events may have been lost while the storage's connection was down, tell the "missed" handlers"""
+        for handler in self.handlers["missed"]:
+            try:
+                handler()
+            except Exception:
+                logging.exception("Failed to handle missed cluster events")
+
+    def received(self, payload):
+        message = json.loads(payload)
+        if message["worker"] == self.worker:
+            return
+        for event in message["events"]:
+            for handler in self.handlers[event["type"]]:
+                try:
+                    handler(event)
+                except Exception:
+                    logging.exception(f"Failed to handle cluster event {event['type']}")
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import sys
+
+
+class LRUCache(object):
+    """A size bounded least recently used cache for encoded db records, optionally tagged with their row version"""
+
+    def __init__(self, budget=32 * 1024 * 1024):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._versions = dict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    @staticmethod
+    def sizeof(value):
+        return sys.getsizeof(value)
+
+    def get(self, key, default=None):
+        """Get a value from the cache, marking it as recently used"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def version(self, key):
+        """Get the row version of a cached value, or None if it isn't known"""
+        return self._versions.get(key)
+
+    def set(self, key, value, version=None):
+        """Set a value, evicting the least recently used entries if over budget.
+        A value older than the version already cached is ignored."""
+        current = self._versions.get(key)
+        if version is not None and current is not None and version < current:
+            return
+        self.pop(key)
+        size = self.sizeof(value)
+        if size > self.budget:
+            return
+
+        self._data[key] = value
+        if version is not None:
+            self._versions[key] = version
+        self.size += size
+        while self.size > self.budget:
+            old_key, old = self._data.popitem(last=False)
+            self._versions.pop(old_key, None)
+            self.size -= self.sizeof(old)
+            self.evictions += 1
+
+    def pop(self, key):
+        """Remove a value from the cache if it exists"""
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            return
+        self._versions.pop(key, None)
+        self.size -= self.sizeof(value)
+        return value
+
+    def clear(self):
+        self._data.clear()
+        self._versions.clear()
+        self.size = 0
+
+    def stats(self):
+        """Get the cache's hit/miss counters and usage"""
+        total = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            entries=len(self._data),
+            size=self.size,
+            budget=self.budget,
+            ratio=self.hits / total if total else 0.0,
+        )
@@ -1,20 +1,20 @@
 import discord
 from discord.ext import commands
 from recordclass import recordclass as namedtuple
-import ujson as json
 
 from collections import Counter
+from time import time
 import re
-import asyncio
 
-from .translation import _
+from .experience import level_up
+from .paginator import Paginator, split_field
 
 Pokemon = namedtuple("Pokemon", ["id", "name", "type", "stats", "meta"])
 ServerItem = namedtuple("ServerItem", ["name", "description", "meta"])
 Character = namedtuple("Character", ["name", "owner", "description", "level", "team", "meta"])
 gc = namedtuple("Guild",
                 ["name", "owner", "description", "members", "bank", "items", "open", "image", "icon", "invites",
-                 "mods"])
+                 "mods", "interest", "settled"])
 Map = namedtuple("Map", ["tiles", "generators", "spawners", "spawn", "maxx", "maxy"])
 AdvancedMap = namedtuple("AdvancedMap", ["tiles", "generators", "spawners", "spawnables", "spawn", "type"])
 
@@ -56,7 +56,7 @@ class Guild(gc):
     __slots__ = ()
 
     def __new__(cls, name, owner, description="", members=None, bank=0, items=None, open=False, image=None, icon=None,
-                invites=None, mods=None):
+                invites=None, mods=None, interest=0, settled=None):
         if members is None:
             members = set()
         if items is None:
@@ -65,7 +65,8 @@ class Guild(gc):
             invites = set()
         if mods is None:
             mods = set()
-        return super().__new__(cls, name, owner, description, members, bank, items, open, image, icon, invites, mods)
+        return super().__new__(cls, name, owner, description, members, bank, items, open, image, icon, invites, mods,
+                               interest, settled)
 
 
 class MemberConverter(commands.MemberConverter):
@@ -141,18 +142,17 @@ def validate_url(url):
     return bool(regex.fullmatch(url))
 
 
-def get(iterable, **attrs):
-    attr, val = list(attrs.items())[0]
+def get_member(guild, user_id):
+    """Look up a member of a guild by id in constant time, None if they aren't in it"""
+    if user_id is None:
+        return None
+    return guild.get_member(int(user_id))
 
-    fin = [element for element in iterable if getattr(element, attr) in val]
-    fin.sort(key=lambda x: val.index(getattr(x, attr)))
 
-    if len(fin) < len(val):
-        fin = []
-        for x in val:
-            fin.append(discord.utils.get(iterable, **{attr: x}))
-
-    return None or fin
+def get_members(guild, user_ids):
+    """Look up many members of a guild by id, in the same order, with None for any that aren't in it"""
+    lookup = guild.get_member
+    return [lookup(int(user_id)) if user_id is not None else None for user_id in user_ids]
 
 
 def chunkn(s, n=2000, splitter="\n"):
@@ -176,101 +176,33 @@ async def create_pages(ctx, items, lfmt,
                        author=None, author_url=None,
                        emotes=("\u2B05", "\u27A1", "\u274C"),
                        thumbnail=None, footer=None, chunk=25):
-    embed = discord.Embed(description=description, title=title)
-    embed.set_author(name=author, icon_url=author_url)
-    if thumbnail:
-        embed.set_thumbnail(
-            url=thumbnail
-        )
-    if footer:
-        embed.set_footer(text=footer)
-
-    items = {k: lfmt(v) for k, v in items}
-    ctr = 0
-    while any(len(v) > 500 for v in items.values()) and ctr < 10:
-        additions = {}
-        for k, v in items.items():
-            if len(v) > 500:
-                count = 0
-                start = ""
-                end = ""
-                for item in v.split("\n"):
-                    if count + len(item) > 500:
-                        end += item + "\n"
-                    else:
-                        start += item + "\n"
-                        count += len(item) + 1
-                additions[k] = start.strip()
-                if end.strip():
-                    additions[k + " continued"] = end.strip()
-        items.update(additions)
-        ctr += 1
-    i = 0
-    ditems = items
-    items = list(items.items())
-    items.sort()
-
-    chunks = []
-    for j in range(0, len(items), chunk):
-        chunks.append(items[j:j + chunk])
-
-    for item, value in chunks[i]:
-        embed.add_field(name=item, value=ditems[item])
-
-    end = len(chunks) - 1
-
-    msg = await ctx.send(embed=embed)
-    for emote in emotes:
-        await msg.add_reaction(emote)
-
-    while True:
-        try:
-            r, u = await ctx.bot.wait_for("reaction_add", check=lambda r, u: r.message.id == msg.id, timeout=80)
-        except asyncio.TimeoutError:
-            await ctx.send(await _(ctx, "Timed out! Try again"))
-            await msg.delete()
-            return
-
-        if u == ctx.guild.me:
-            continue
-
-        if u != ctx.author or r.emoji not in emotes:
-            try:
-                await msg.remove_reaction(r.emoji, u)
-            except:
-                pass
-            continue
-
-        if r.emoji == emotes[0]:
-            if i == 0:
-                pass
-            else:
-                embed.clear_fields()
-                i -= 1
-                for item, value in chunks[i]:
-                    embed.add_field(name=item, value=ditems[item])
+    """Page through (name, value) items as embed fields, sorted by name, at most chunk fields a page.
+    Values are formatted with lfmt and long ones split into several fields, only for the pages shown"""
+    items = sorted(items, key=lambda item: item[0])
+    starts = [0]  # The first item of each page worked out so far
+
+    def fields(start):
+        page = []
+        end = start
+        while end < len(items):
+            name, value = items[end]
+            split = split_field(name, lfmt(value))
+            if page and len(page) + len(split) > chunk:
+                break
+            page.extend(split)
+            end += 1
+        return page, end
 
-                await msg.edit(embed=embed)
+    async def render(index):
+        while len(starts) <= index and starts[-1] < len(items):
+            starts.append(fields(starts[-1])[1])
+        if index >= len(starts) or (index and starts[index] >= len(items)):
+            return None
+        return None, fields(starts[index])[0]
 
-        elif r.emoji == emotes[1]:
-            if i == end:
-                pass
-            else:
-                embed.clear_fields()
-                i += 1
-                for item, value in chunks[i]:
-                    embed.add_field(name=item, value=ditems[item])
-
-                await msg.edit(embed=embed)
-        else:
-            await msg.delete()
-            await ctx.send(await _(ctx, "Closing"))
-            return
-
-        try:
-            await msg.remove_reaction(r.emoji, u)
-        except:
-            pass
+    paginator = Paginator(ctx, render, emotes=emotes, title=title, description=description, author=author,
+                          author_url=author_url, thumbnail=thumbnail, footer=footer)
+    await paginator.run()
 
 
 default_user = {
@@ -279,7 +211,8 @@ default_user = {
     "items": dict(),
     "guild": None,
     "level": 1,
-    "exp": 0
+    "exp": 0,
+    "settled": None  # When salaries were last paid out to the user, see `accrual_mutation`
 }
 
 default_server = {
@@ -382,16 +315,183 @@ example_map = {
 }
 
 
+def eco_mutation(amount):
+    """Make a user data mutation giving (or taking) money"""
+    def mutate(ud):
+        ud["money"] += amount
+        if ud["money"] < 0:
+            raise ValueError("Cannot take more than user has!")
+        return ud["money"]
+
+    return mutate
+
+
+def give_mutation(items):
+    """Make a user data mutation giving (item, amount) pairs"""
+    def mutate(ud):
+        ud["items"] = Counter(ud["items"])
+        ud["items"].update(dict(items))
+        return ud["items"]
+
+    return mutate
+
+
+def take_mutation(items):
+    """Make a user data mutation taking (item, amount) pairs"""
+    def mutate(ud):
+        ud["items"] = Counter(ud["items"])
+        ud["items"].subtract(dict(items))
+
+        for item, value in list(ud["items"].items()):
+            if value < 0:
+                raise ValueError("Cannot take more items than the user has!")
+            if value == 0:
+                del ud["items"][item]
+        return ud["items"]
+
+    return mutate
+
+
+DAY = 86400
+
+
+def salary_offset(guild_id):
+    """Seconds after midnight UTC a server's payday starts, spread over the day so they don't all fall at once"""
+    return guild_id % DAY
+
+
+def paydays(since, now, offset):
+    """Count the paydays after the timestamp `since` up to `now`, for a server paid `offset` seconds into the day"""
+    if since is None:
+        return 0
+    return max(int((now - offset) // DAY - (since - offset) // DAY), 0)
+
+
+def parse_salary(salary):
+    """Split a role's salary into its money and (item, amount) pairs"""
+    if isinstance(salary, (int, float)):
+        return salary, ()
+    return (sum(filter(lambda x: isinstance(x, (int, float)), salary)),
+            tuple(filter(lambda x: isinstance(x, (list, tuple)), salary)))
+
+
+def member_salary(member, salaries):
+    """Add up a member's daily salary over all of their roles, as (money, Counter of items)"""
+    money, items = 0, Counter()
+    for role in member.roles:
+        salary = salaries.get(str(role.id))
+        if salary is not None:
+            amount, give = parse_salary(salary)
+            money += amount
+            items.update(dict(give))
+    return money, items
+
+
+def accrual_mutation(money, items, offset, now):
+    """Make a user data mutation paying a daily salary for every payday since the user was last settled.
+    Users who were never settled start accruing from now. Returns the number of days paid."""
+    def mutate(ud):
+        days = paydays(ud.get("settled"), now, offset)
+        ud["settled"] = now
+        if days and (money or items):
+            salary_mutation(money * days, [(item, amount * days) for item, amount in items.items()])(ud)
+        return days
+
+    return mutate
+
+
+def interest_due(guild, offset, now):
+    """Whether a stored guild's bank has interest to settle"""
+    if len(guild) < 13 or not guild[11]:
+        return False
+    return guild[12] is None or paydays(guild[12], now, offset) > 0
+
+
+def settle_interest(guild, offset, now):
+    """Add a stored guild's bank interest, compounded for every payday since it was last settled"""
+    guild.extend([0, None][len(guild) - 11:])  # Guilds made before banks had interest
+    if guild[11]:
+        days = paydays(guild[12], now, offset)
+        if days:
+            guild[4] = round(guild[4] * (1 + guild[11]) ** days, 2)
+        guild[12] = now
+
+
+def salary_mutation(amount, items):
+    """Make a user data mutation paying a salary of money and (item, amount) pairs.
+    A negative salary empties the user's balance rather than failing."""
+    def mutate(ud):
+        ud["money"] = max(ud["money"] + amount, 0)
+        if items:
+            ud["items"] = Counter(ud["items"])
+            ud["items"].update(dict(items))
+            for item, value in list(ud["items"].items()):
+                if value <= 0:
+                    del ud["items"][item]
+
+    return mutate
+
+
+class Transaction(object):
+    """Stages changes to several users and guild sections and commits them together in one database transaction.
+    Used as `async with bot.di.transaction() as tr:`, nothing is saved if any of the changes fail."""
+
+    def __init__(self, di):
+        self.di = di
+        self.db = di.db
+        self.users = []
+        self.sections = []
+        self.settle = dict()  # (guild id, user id): member, to pay their accrued salary before changing their balance
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.commit()
+
+    def mutate_user(self, member, mutate):
+        """Stage a mutation of a user's server data, see `Database.mutate_user`"""
+        self.users.append((member, mutate))
+
+    def mutate_guild_section(self, guild, section, mutate):
+        """Stage a mutation of a guild section, see `Database.mutate_guild_section`"""
+        self.sections.append((guild, section, mutate))
+
+    def add_eco(self, member, amount):
+        # Salaries come from roles, a stand-in for someone who left the guild (such as a seller) has none to settle
+        if isinstance(member, discord.Member):
+            self.settle[(member.guild.id, member.id)] = member
+        self.mutate_user(member, eco_mutation(amount))
+
+    def give_items(self, member, *items):
+        self.mutate_user(member, give_mutation(items))
+
+    def take_items(self, member, *items):
+        self.mutate_user(member, take_mutation(items))
+
+    async def commit(self):
+        settle = await self.di.accruals(self.settle.values())
+        await self.db.commit(settle + self.users, self.sections)
+        self.users.clear()
+        self.sections.clear()
+        self.settle.clear()
+
+
 class DataInteraction(object):
     def __init__(self, bot):
         self.bot = bot
         self.db = self.bot.db
 
+    def transaction(self):
+        """Start a unit of work, see `Transaction`"""
+        return Transaction(self)
+
     async def get_team(self, guild, character):
-        gd = await self.db.get_guild_data(guild)
-        character = Character(*gd["characters"][character])
-        owner = discord.utils.get(guild.members, id=character.owner)
-        ud = await self.db.get_user_data(owner)
+        characters = await self.db.read_section(guild, "characters")
+        character = Character(*characters[character])
+        owner = get_member(guild, character.owner)
+        ud = await self.db.read_user(owner)
 
         pokemon = [Pokemon(*x) for x in ud["box"] if x[0] in character.team]
 
@@ -399,17 +499,48 @@ class DataInteraction(object):
 
     async def get_box(self, member):
         """Get user's Pokemon box"""
-        ub = await self.db.user_item(member, "box")
-        return [Pokemon(*x) for x in json.decode(ub)]
+        return [Pokemon(*x) for x in await self.db.user_item(member, "box")]
 
     async def get_balance(self, member):
-        """Get user's balance"""
-        return float(await self.db.user_item(member, "money"))
+        """Get user's balance including any salary they've accrued, which is only saved if it changes their data"""
+        ud = await self.db.read_user(member)
+        now = time()
+        if not paydays(ud.get("settled"), now, salary_offset(member.guild.id)):
+            return float(ud["money"])
+
+        settle = await self.accrual(member, now)
+        money, items = ud["money"], dict(ud["items"])
+        settle(ud)  # read_user gives a copy, so this only works out what they'd have
+        if ud["money"] == money and ud["items"] == items:
+            return float(money)
+
+        def mutate(ud):
+            settle(ud)
+            return float(ud["money"])
+
+        return await self.db.mutate_user(member, mutate)
+
+    async def accrual(self, member, now=None):
+        """Make a mutation settling a member's salary up to now, see `accrual_mutation`"""
+        money, items = member_salary(member, await self.get_salaries(member.guild))
+        return accrual_mutation(money, items, salary_offset(member.guild.id), now or time())
+
+    async def accruals(self, members, now=None):
+        """Make mutations settling many members' salaries up to now, as [(member, mutation)]"""
+        now = now or time()
+        salaries = dict()
+        settle = []
+        for member in members:
+            guild = member.guild
+            if guild.id not in salaries:
+                salaries[guild.id] = await self.get_salaries(guild)
+            money, items = member_salary(member, salaries[guild.id])
+            settle.append((member, accrual_mutation(money, items, salary_offset(guild.id), now)))
+        return settle
 
     async def get_inventory(self, member):
         """Get user's inventory"""
-        ui = await self.db.user_item(member, "items")
-        return json.decode(ui)
+        return await self.db.user_item(member, "items")
 
     async def get_user_guild(self, member):
         """Get user's associated guild"""
@@ -418,7 +549,7 @@ class DataInteraction(object):
 
     async def get_user_level(self, member):
         """Get user's level"""
-        ud = await self.db.get_user_data(member)
+        ud = await self.db.read_user(member)
         return (ud.get("level", 1), ud.get("exp", 0))
 
     async def get_pokemon(self, member, id):
@@ -432,44 +563,40 @@ class DataInteraction(object):
 
     async def get_guild_start(self, guild):
         """Get a Server's user starting balance"""
-        return (await self.db.get_guild_data(guild)).get("start", 0)
+        return (await self.db.read_section(guild, "settings")).get("start", 0)
 
     async def get_guild_recipes(self, guild):
-        recipes = (await self.db.get_guild_data(guild)).get("recipes", {})
+        recipes = await self.db.read_section(guild, "recipes")
         return {a if isinstance(a, str) else " ".join(a): b for a, b in recipes.items()}
 
     async def get_guild_items(self, guild):
         """Get all the items available in a server"""
-        gd = await self.db.get_guild_data(guild)
-        return {y: ServerItem(*x) for y, x in gd["items"].items()}
+        items = await self.db.read_section(guild, "items")
+        return {y: ServerItem(*x) for y, x in items.items()}
 
     async def get_guild_lootboxes(self, guild):
         """Get a server's lootboxes"""
-        gd = await self.db.get_guild_data(guild)
-        return gd.get("lootboxes", dict())
+        return await self.db.read_section(guild, "lootboxes")
 
     async def get_guild_market(self, guild):
         """Get the current market of a server"""
-        gd = await self.db.get_guild_data(guild)
-        return gd.get("market_items", dict())
+        return await self.db.read_section(guild, "market_items")
 
     async def get_guild_shop(self, guild):
         """Get the current market of a server"""
-        gd = await self.db.get_guild_data(guild)
-        return gd.get("shop_items", dict())
+        return await self.db.read_section(guild, "shop_items")
 
     async def get_guild_characters(self, guild):
         """Get all the characters for a server"""
-        gd = await self.db.get_guild_data(guild)
-        return {y: Character(*x) for y, x in gd["characters"].items()}
+        characters = await self.db.read_section(guild, "characters")
+        return {y: Character(*x) for y, x in characters.items()}
 
     async def get_character(self, guild, name):
         chrs = await self.get_guild_characters(guild)
         return chrs.get(name)
 
     async def get_map(self, guild, name):
-        gd = await self.db.get_guild_data(guild)
-        maps = gd.get("maps", {})
+        maps = await self.db.read_section(guild, "maps")
         if isinstance(maps, Map):
             maps = {"Default": maps}
         map = maps.get(name)
@@ -480,242 +607,242 @@ class DataInteraction(object):
         return Map(*map)
 
     async def get_maps(self, guild):
-        gd = await self.db.get_guild_data(guild)
-        maps = gd.get("maps", {})
+        maps = await self.db.read_section(guild, "maps")
         if isinstance(maps, Map):
             maps = {"Default": maps}
         return {name: Map(*map) if not isinstance(map[3], dict) else AdvancedMap(*map) for name, map in maps.items()}
 
     async def get_language(self, guild):
-        gd = await self.db.get_guild_data(guild)
+        gd = await self.db.read_section(guild, "settings")
         return gd.get("lang", {})
 
     async def get_exp_enabled(self, guild):
-        gd = await self.db.get_guild_data(guild)
+        gd = await self.db.read_section(guild, "settings")
         return gd.get("exp", True)
 
     async def get_salaries(self, guild):
-        gd = await self.db.get_guild_data(guild)
-        return gd.get("salaries", {})
+        return await self.db.read_section(guild, "salaries")
 
     async def get_currency(self, guild):
-        gd = await self.db.get_guild_data(guild)
+        gd = await self.db.read_section(guild, "settings")
         return gd.get("currency", "$")
 
     async def get_delete_time(self, guild):
-        gd = await self.db.get_guild_data(guild)
+        gd = await self.db.read_section(guild, "settings")
         t = gd.get("msgdel", None)
         return t if t is not 0 else None
 
     async def get_guild_guilds(self, guild):
-        """Get a server's guilds"""
-        gd = await self.db.get_guild_data(guild)
-        gobj = {y: Guild(*x) for y, x in gd.get("guilds", dict()).items()}
+        """Get a server's guilds, first adding any interest their banks have accrued"""
+        guilds = await self.db.read_section(guild, "guilds")
+        offset, now = salary_offset(guild.id), time()
+        if any(interest_due(x, offset, now) for x in guilds.values()):
+            def mutate(guilds):
+                for x in guilds.values():
+                    if interest_due(x, offset, now):
+                        settle_interest(x, offset, now)
+
+            await self.db.mutate_guild_section(guild, "guilds", mutate)
+            guilds = await self.db.read_section(guild, "guilds")
+        gobj = {y: Guild(*x) for y, x in guilds.items()}
         return gobj
 
     async def add_pokemon(self, owner, pokemon):
         """Create a Pokemon for a user's box"""
-        ud = await self.db.get_user_data(owner)
-        if not 'id' in pokemon:
-            id = ud["box"][-1][0] + 1 if ud["box"] else 0
-            ud["box"].append(Pokemon(**pokemon, id=id))
-        else:
-            id = pokemon['id']
-            ud["box"].append(Pokemon(**pokemon))
-        await self.db.update_user_data(owner, ud)
-        return id
+        def mutate(ud):
+            if not 'id' in pokemon:
+                id = ud["box"][-1][0] + 1 if ud["box"] else 0
+                ud["box"].append(Pokemon(**pokemon, id=id))
+            else:
+                id = pokemon['id']
+                ud["box"].append(Pokemon(**pokemon))
+            return id
+
+        return await self.db.mutate_user(owner, mutate)
 
     async def remove_pokemon(self, owner, id):
         """Remove a Pokemon from a user's box"""
-        ud = await self.db.get_user_data(owner)
-        for x in ud["box"]:
-            if x[0] == id:
-                break
-        else:
-            raise ValueError("This is not a valid ID!")
-        ud["box"].remove(x)
-        await self.db.update_user_data(owner, ud)
-        return Pokemon(*x)
+        def mutate(ud):
+            for x in ud["box"]:
+                if x[0] == id:
+                    break
+            else:
+                raise ValueError("This is not a valid ID!")
+            ud["box"].remove(x)
+            return Pokemon(*x)
+
+        return await self.db.mutate_user(owner, mutate)
 
     async def new_item(self, guild, serveritem):
         """Create a new server item"""
-        gd = await self.db.get_guild_data(guild)
-        gd["items"][serveritem.name] = serveritem
-        await self.db.update_guild_data(guild, gd)
+        def mutate(items):
+            items[serveritem.name] = serveritem
+
+        await self.db.mutate_guild_section(guild, "items", mutate)
 
     async def new_items(self, guild, serveritems):
         """Create a new server item"""
-        gd = await self.db.get_guild_data(guild)
-        for item in serveritems:
-            gd["items"][item.name] = item
-        await self.db.update_guild_data(guild, gd)
+        def mutate(items):
+            for item in serveritems:
+                items[item.name] = item
+
+        await self.db.mutate_guild_section(guild, "items", mutate)
 
     async def remove_item(self, guild, item):
         """Remove a server item"""
-        gd = await self.db.get_guild_data(guild)
-        del gd["items"][item]
-        await self.db.update_guild_data(guild, gd)
+        def mutate(items):
+            del items[item]
+
+        await self.db.mutate_guild_section(guild, "items", mutate)
 
     async def remove_items(self, guild, *items):
         """Remove a server item"""
-        gd = await self.db.get_guild_data(guild)
-        for item in items:
-            del gd["items"][item]
-        await self.db.update_guild_data(guild, gd)
+        def mutate(gitems):
+            for item in items:
+                del gitems[item]
+
+        await self.db.mutate_guild_section(guild, "items", mutate)
 
     async def add_character(self, guild, character):
         """Add a new character to a guild"""
-        gd = await self.db.get_guild_data(guild)
-        gd["characters"][character.name] = character
-        await self.db.update_guild_data(guild, gd)
+        def mutate(characters):
+            characters[character.name] = character
+
+        await self.db.mutate_guild_section(guild, "characters", mutate)
 
     async def remove_character(self, guild, name):
         """Remove a character from a guild"""
-        gd = await self.db.get_guild_data(guild)
-        del gd["characters"][name]
-        await self.db.update_guild_data(guild, gd)
+        def mutate(characters):
+            del characters[name]
+
+        await self.db.mutate_guild_section(guild, "characters", mutate)
 
     async def give_items(self, member, *items):
         """Give a user items"""
-        ud = await self.db.get_user_data(member)
-        ud["items"] = Counter(ud["items"])
-        ud["items"].update(dict(items))
-        await self.db.update_user_data(member, ud)
-        return ud["items"]
+        return await self.db.mutate_user(member, give_mutation(items))
 
     async def take_items(self, member, *items):
         """Take items from a user"""
-        ud = await self.db.get_user_data(member)
-        ud["items"] = Counter(ud["items"])
-        ud["items"].subtract(dict(items))
-
-        for item, value in list(ud["items"].items()):
-            if value < 0:
-                raise ValueError("Cannot take more items than the user has!")
-            if value == 0:
-                del ud["items"][item]
-
-        await self.db.update_user_data(member, ud)
-        return ud["items"]
+        return await self.db.mutate_user(member, take_mutation(items))
 
     async def update_items(self, member, *items):
         """Take items from a user"""
-        ud = await self.db.get_user_data(member)
-        ud["items"] = Counter(ud["items"])
-        ud["items"].update(dict(items))
+        def mutate(ud):
+            ud["items"] = Counter(ud["items"])
+            ud["items"].update(dict(items))
 
-        for item, value in list(ud["items"].items()):
-            if value <= 0:
-                del ud["items"][item]
+            for item, value in list(ud["items"].items()):
+                if value <= 0:
+                    del ud["items"][item]
+            return ud["items"]
 
-        await self.db.update_user_data(member, ud)
-        return ud["items"]
+        return await self.db.mutate_user(member, mutate)
 
     async def add_eco(self, member, amount):
-        """Give (or take) a user('s) money"""
-        ud = await self.db.get_user_data(member)
-        ud["money"] += amount
-        if ud["money"] < 0:
-            raise ValueError("Cannot take more than user has!")
-        await self.db.update_user_data(member, ud)
-        return ud["money"]
+        """Give (or take) a user('s) money, after paying them any salary they've accrued"""
+        settle = await self.accrual(member)
+        eco = eco_mutation(amount)
+
+        def mutate(ud):
+            settle(ud)
+            return eco(ud)
+
+        return await self.db.mutate_user(member, mutate)
 
     async def update_salaries(self, guild, data):
-        gd = await self.db.get_guild_data(guild)
-        gd["salaries"] = data
-        await self.db.update_guild_data(guild, gd)
+        await self.db.update_guild_section(guild, "salaries", data)
+
+    async def remove_salaries(self, guild, *roles):
+        """Remove the salaries of the given role ids"""
+        def mutate(salaries):
+            for role in roles:
+                salaries.pop(str(role), None)
+
+        await self.db.mutate_guild_section(guild, "salaries", mutate)
 
     async def set_delete_time(self, guild, time):
-        gd = await self.db.get_guild_data(guild)
-        gd["msgdel"] = time
-        await self.db.update_guild_data(guild, gd)
+        await self.db.update_guild_settings(guild, msgdel=time)
 
     async def set_language(self, guild, language):
-        gd = await self.db.get_guild_data(guild)
-        gd["lang"] = language
-        await self.db.update_guild_data(guild, gd)
+        await self.db.update_guild_settings(guild, lang=language)
+        self.bot.translations.forget(guild)
 
     async def set_currency(self, guild, currency):
         if len(currency) > 30:
             raise ValueError("Currency prefix too long!")
-        gd = await self.db.get_guild_data(guild)
-        gd["currency"] = currency
-        await self.db.update_guild_data(guild, gd)
+        await self.db.update_guild_settings(guild, currency=currency)
+        self.bot.translations.forget(guild)
 
     async def set_eco(self, member, amount):
-        """Set a user's balance"""
-        ud = await self.db.get_user_data(member)
-        ud["money"] = amount
-        await self.db.update_user_data(member, ud)
-        return ud["money"]
+        """Set a user's balance, settling their accrued salary first so it isn't paid on top later"""
+        settle = await self.accrual(member)
+
+        def mutate(ud):
+            settle(ud)
+            ud["money"] = amount
+            return ud["money"]
+
+        return await self.db.mutate_user(member, mutate)
 
     async def set_start(self, guild, amount):
         """Set a server's user start balance"""
-        gd = await self.db.get_guild_data(guild)
-        gd["start"] = amount
-        await self.db.update_guild_data(guild, gd)
+        await self.db.update_guild_settings(guild, start=amount)
+
+    def exp_mutation(self, exp):
+        """Make a user data mutation giving experience, which returns the new level if they levelled up"""
+        def mutate(ud):
+            if ud.get("level") is None:
+                ud["level"] = 0
+                ud["exp"] = 0
+            s = ud["level"]
+            ud["level"], ud["exp"] = level_up(ud["level"], ud["exp"] + exp)
+            return ud["level"] if ud["level"] > s else None
+
+        return mutate
 
     async def add_exp(self, member, exp):
-        ud = await self.bot.db.get_user_data(member)
-        if ud.get("level") is None:
-            ud["level"] = 0
-            ud["exp"] = 0
-        s = ud["level"]
-        ud["exp"] += exp
-        next = self.bot.get_exp(ud["level"])
-        while ud["exp"] > next:
-            ud["level"] += 1
-            ud["exp"] -= next
-            next = self.bot.get_exp(ud["level"])
-
-        await self.db.update_user_data(member, ud)
-        return ud["level"] if ud["level"] > s else None
+        return await self.db.mutate_user(member, self.exp_mutation(exp))
 
     async def set_exp_enabled(self, guild, value):
-        gd = await self.db.get_guild_data(guild)
-        gd["exp"] = value
-        await self.db.update_guild_data(guild, gd)
+        await self.db.update_guild_settings(guild, exp=value)
 
     async def add_recipe(self, guild, name: str, itemsin: dict, itemsout: dict):
-        gd = await self.db.get_guild_data(guild)
-        if "recipes" not in gd:
-            gd["recipes"] = {}
-        recipes = gd["recipes"]
-        recipes[name] = (itemsin, itemsout)
-        await self.db.update_guild_data(guild, gd)
+        def mutate(recipes):
+            recipes[name] = (itemsin, itemsout)
+
+        await self.db.mutate_guild_section(guild, "recipes", mutate)
 
     async def remove_recipe(self, guild, name):
-        gd = await self.db.get_guild_data(guild)
-        del gd.get("recipes", {})[name]
-        await self.db.update_guild_data(guild, gd)
+        def mutate(recipes):
+            del recipes[name]
+
+        await self.db.mutate_guild_section(guild, "recipes", mutate)
 
     async def add_to_team(self, guild, character, id):
         """Add a pokemon to a character's team"""
-        gd = await self.db.get_guild_data(guild)
-        character = gd["characters"][character]
-        character[4].append(id)
-        if len(character[4]) > 6:
-            raise ValueError("Team is limited to 6!")
-        await self.db.update_guild_data(guild, gd)
+        def mutate(characters):
+            team = characters[character][4]
+            team.append(id)
+            if len(team) > 6:
+                raise ValueError("Team is limited to 6!")
+
+        await self.db.mutate_guild_section(guild, "characters", mutate)
 
     async def set_guild(self, member, name):
-        ud = await self.db.get_user_data(member)
-        ud["guild"] = name
-        await self.db.update_user_data(member, ud)
+        await self.db.update_user_fields(member, guild=name)
 
     async def set_map(self, guild, name, map):
-        gd = await self.db.get_guild_data(guild)
-        if "maps" not in gd:
-            gd["maps"] = {}
-        gd["maps"][name] = map
-        return await self.db.update_guild_data(guild, gd)
+        def mutate(maps):
+            maps[name] = map
+
+        return await self.db.mutate_guild_section(guild, "maps", mutate)
 
     async def remove_map(self, guild, name):
-        gd = await self.db.get_guild_data(guild)
-        maps = gd.get("maps")
-        if maps and name in maps:
-            del gd["maps"][name]
-        return await self.db.update_guild_data(guild, gd)
+        def mutate(maps):
+            if maps and name in maps:
+                del maps[name]
+
+        return await self.db.mutate_guild_section(guild, "maps", mutate)
 
     async def set_pos(self, guild, map, character, pos):
         char = await self.get_character(guild, character)
@@ -726,54 +853,116 @@ class DataInteraction(object):
         await self.add_character(guild, character)
 
     async def set_level(self, member, level, exp):
-        ud = await self.db.get_user_data(member)
-        ud["level"] = level
-        ud["exp"] = exp
-        return await self.db.update_user_data(member, ud)
+        return await self.db.update_user_fields(member, level=level, exp=exp)
+
+    # Bulk operations, for commands targeting a role or everyone. Each member is changed once however often
+    # they're given, and nobody is changed if the change fails for any of them.
+    ########################################################################
+    async def add_eco_many(self, members, amount):
+        """Give (or take) many users money, after paying them any salary they've accrued"""
+        members = list(members)
+        return await self.db.mutate_users(members, eco_mutation(amount), before=await self.accruals(members))
+
+    async def set_eco_many(self, members, amount):
+        """Set many users' balances, settling their accrued salaries first"""
+        members = list(members)
+
+        def mutate(ud):
+            ud["money"] = amount
+
+        await self.db.mutate_users(members, mutate, before=await self.accruals(members))
+
+    async def give_items_many(self, members, *items):
+        """Give many users items"""
+        return await self.db.mutate_users(members, give_mutation(items))
+
+    async def take_items_many(self, members, *items):
+        """Take items from many users"""
+        return await self.db.mutate_users(members, take_mutation(items))
+
+    async def wipe_many(self, members):
+        """Empty many users' inventories"""
+        def mutate(ud):
+            ud["items"] = {}
+
+        await self.db.mutate_users(members, mutate)
+
+    async def set_level_many(self, members, level, exp=0):
+        def mutate(ud):
+            ud["level"] = level
+            ud["exp"] = exp
+
+        await self.db.mutate_users(members, mutate)
+
+    async def pay_salary_many(self, members, amount, items=()):
+        """Pay many users the same salary, see `salary_mutation`"""
+        await self.db.mutate_users(members, salary_mutation(amount, items))
+
+    async def add_exp_many(self, members, exp):
+        """Give many users experience, returns {member: new level or None}"""
+        return await self.db.mutate_users(members, self.exp_mutation(exp))
 
     async def remove_from_team(self, guild, character, id):
         """Remove a pokemon from a character's team"""
-        gd = await self.db.get_guild_data(guild)
-        character = gd[4][character]
-        character[4].remove(id)
-        await self.db.update_guild_data(guild, gd)
+        def mutate(characters):
+            characters[character][4].remove(id)
+
+        await self.db.mutate_guild_section(guild, "characters", mutate)
 
     async def update_guild_market(self, guild, data):
         """Update a server's market"""
-        gd = await self.db.get_guild_data(guild)
-        gd["market_items"] = data
-        return await self.db.update_guild_data(guild, gd)
+        return await self.db.update_guild_section(guild, "market_items", data)
 
     async def update_guild_lootboxes(self, guild, data):
         """Update a server's lootboxes"""
-        gd = await self.db.get_guild_data(guild)
-        gd["lootboxes"] = data
-        return await self.db.update_guild_data(guild, gd)
+        return await self.db.update_guild_section(guild, "lootboxes", data)
 
     async def update_guild_guilds(self, guild, data):
         """Update a server's guilds"""
-        gd = await self.db.get_guild_data(guild)
-        gd["guilds"] = data
-        return await self.db.update_guild_data(guild, gd)
+        return await self.db.update_guild_section(guild, "guilds", data)
+
+    async def add_guild_bank(self, guild, name, amount):
+        """Add (or take) money to a guild's bank, after adding any interest it has accrued"""
+        offset, now = salary_offset(guild.id), time()
+
+        def mutate(guilds):
+            settle_interest(guilds[name], offset, now)
+            guilds[name][4] += amount
+            if guilds[name][4] < 0:
+                raise ValueError("Cannot take more than the guild has!")
+            return guilds[name][4]
+
+        return await self.db.mutate_guild_section(guild, "guilds", mutate)
+
+    async def set_guild_interest(self, guild, name, rate):
+        """Set the daily interest rate of a guild's bank, settling what it earned at the old rate first"""
+        offset, now = salary_offset(guild.id), time()
+
+        def mutate(guilds):
+            settle_interest(guilds[name], offset, now)
+            guilds[name][11] = rate
+            guilds[name][12] = now
+
+        return await self.db.mutate_guild_section(guild, "guilds", mutate)
 
     async def remove_guild(self, guild, name):
-        gd = await self.db.get_guild_data(guild)
-        for mid in gd["guilds"][name][3]:
-            try:
-                await self.set_guild(discord.utils.get(guild.members, id=mid), None)
-            except:
-                pass
-        del gd["guilds"][name]
-        return await self.db.update_guild_data(guild, gd)
+        guilds = await self.db.get_guild_section(guild, "guilds")
+        members = [member for member in get_members(guild, guilds[name][3]) if member is not None]
+
+        def leave(ud):
+            ud["guild"] = None
+
+        await self.db.mutate_users(members, leave)
+
+        def mutate(guilds):
+            del guilds[name]
+
+        return await self.db.mutate_guild_section(guild, "guilds", mutate)
 
     async def update_guild_shop(self, guild, data):
         """Update a server's market"""
-        gd = await self.db.get_guild_data(guild)
-        gd["shop_items"] = data
-        return await self.db.update_guild_data(guild, gd)
+        return await self.db.update_guild_section(guild, "shop_items", data)
 
     async def add_shop_items(self, guild, data):
         """Update a server's market"""
-        gd = await self.db.get_guild_data(guild)
-        gd["shop_items"].update(data)
-        return await self.db.update_guild_data(guild, gd)
+        return await self.db.mutate_guild_section(guild, "shop_items", lambda shop: shop.update(data))
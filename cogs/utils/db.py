@@ -1,156 +1,541 @@
 import ujson as json
-import asyncpg
 import copy
 
+from . import snapshot
+from .cache import LRUCache
+from .leaderboard import Leaderboards
+from .buffer import WriteBuffer
+from .backends import GUILD_SECTIONS, USER_COLUMNS, PostgresStorage, VersionConflict, split_guild_data
+
 
 class Database(object):
-    def __init__(self, bot):
+    def __init__(self, bot, storage=None, cache_budget=32 * 1024 * 1024, write_behind=None):
         self.bot = bot
+        # Where the data is kept, see `cogs.utils.backends`
+        self.storage = storage if storage is not None else PostgresStorage()
+        # Optional write-behind mode, takes the WriteBuffer options (interval, max_size, max_staleness)
+        self.write_buffer = WriteBuffer(self, **write_behind) if write_behind is not None else None
+        # Encoded records, guild sections keyed by (guild id, section) and users by (user id, guild id)
+        self.guild_cache = LRUCache(cache_budget // 2)
+        self.user_cache = LRUCache(cache_budget // 2)
+        self.leaderboards = Leaderboards()
+        # Tells the other workers of a cluster about written records, see `cogs.utils.bus`
+        self.bus = None
+
+    def cache_stats(self):
+        return dict(guilds=self.guild_cache.stats(), users=self.user_cache.stats())
 
-    @staticmethod
-    def dump(data):
-        return json.dumps(data).replace("'", "''")
+    def buffer_stats(self):
+        return self.write_buffer.stats() if self.write_buffer is not None else None
 
     async def connect(self):
-        self._conn = await asyncpg.create_pool(user='root', password='root',
-                                  database='pokerpg', host='127.0.0.1')
+        await self.storage.connect()
+        if self.write_buffer is not None:
+            self.write_buffer.start(self.bot.loop)
+
+    async def flush(self):
+        """Write out any buffered writes, so queries spanning many records see them"""
+        if self.write_buffer is not None:
+            await self.write_buffer.flush()
+
+    async def close(self):
+        """Stop buffering and flush any buffered writes"""
+        if self.write_buffer is not None:
+            await self.write_buffer.close()
+        if self.bus is not None:
+            await self.bus.close()
+        await self.storage.close()
+
+    async def write_many(self, users, sections):
+        """Write many user records and guild sections in one go,
+        users keyed by (user id, guild id) and sections by (guild id, section)"""
+        await self.storage.write_many(users, sections)
+        self.publish(users, sections)
+
+    def publish(self, users=(), sections=()):
+        """Tell the other workers to drop their cached copies of records that were written"""
+        if self.bus is not None:
+            self.bus.publish("invalidate", users=list(users), sections=list(sections))
+
+    def invalidated(self, event):
+        """Drop the cached copies of records another worker wrote, and keep reads of them off the replica
+        until it has caught up"""
+        users, sections = event["users"], event["sections"]
+        self.storage.wrote([user_id for user_id, _ in users],
+                           [guild_id for _, guild_id in users] + [guild_id for guild_id, _ in sections])
+        for user_id, guild_id in users:
+            self.user_cache.pop((user_id, guild_id))
+            self.leaderboards.drop(guild_id)
+        for guild_id, section in sections:
+            self.guild_cache.pop((guild_id, section))
+
+    def invalidate_all(self):
+        """Drop every cached record, after invalidations from other workers may have been missed"""
+        self.user_cache.clear()
+        self.guild_cache.clear()
+        self.leaderboards.drop_all()
 
     # User functions
     ########################################################################
+    def user_written(self, key, data, version=None):
+        """Cache a user record that was just written and update their place on the leaderboards"""
+        self.user_cache.set(key, json.dumps(data), version)
+        self.leaderboards.update(*key, data)
+        if self.write_buffer is None:
+            # Buffered writes are published once they're flushed
+            self.publish(users=[key])
+        snap = snapshot.current()
+        if snap is not None:
+            snap.users.pop(key, None)
+
+    def section_written(self, key, response, version=None):
+        """Cache an encoded guild section that was just written"""
+        self.guild_cache.set(key, response, version)
+        if self.write_buffer is None:
+            self.publish(sections=[key])
+        snap = snapshot.current()
+        if snap is not None:
+            snap.sections.pop(key, None)
+
+    async def ensure_user(self, member):
+        """Make sure a user's old blob has been copied across before writing to their row"""
+        if self.storage.legacy_users and (member.id, member.guild.id) not in self.user_cache:
+            await self.user_select(member)
+
     async def user_insert(self, member, data):
         """Create a new user entry with the given data"""
-        jd = self.dump({member.guild.id: data})
-        req = f"""INSERT INTO userdata (UUID, info) VALUES ({member.id}, '{jd}')"""
-        async with self._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-            return json.decode(response) if response else response
+        if self.write_buffer is not None:
+            return await self.update_user_record(member.id, member.guild.id, data)
+
+        version = await self.storage.put_user(member.id, member.guild.id, data)
+        self.user_written((member.id, member.guild.id), data, version)
+        return version
 
-    async def user_select(self, member):
+    async def user_record(self, member, versioned=False, primary=False):
+        """Get a user's data for a server and its row version, which is None if it isn't known.
+        Passing versioned skips cached data without a version, it and primary read from the primary database."""
+        key = (member.id, member.guild.id)
+        response = self.user_cache.get(key)
+        version = self.user_cache.version(key)
+        if response is None and self.write_buffer is not None:
+            dirty = self.write_buffer.get_user(*key)
+            if dirty is not None:
+                return copy.deepcopy(dirty), version
+        if response is None or (versioned and version is None):
+            # The storage already decoded the data, it's returned as is and only encoded for the cache
+            data, version = await self.storage.get_user(member.id, member.guild.id, primary=versioned or primary)
+            dirty = self.write_buffer.get_user(*key) if self.write_buffer is not None else None
+            if dirty is not None:
+                data = copy.deepcopy(dirty)
+            self.user_cache.set(key, json.dumps(data), version)
+            return data, version
+        return json.decode(response), version
+
+    async def user_select(self, member, primary=False):
         """Select a user's data for a specified server"""
-        req = f"""SELECT info -> '{member.guild.id}' FROM userdata WHERE UUID = {member.id}"""
-        async with self._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-        return json.decode(response) if response else response
+        return (await self.user_record(member, primary=primary))[0]
 
     async def user_full_select(self, member):
-        """Select a user's data for a specified server"""
-        req = f"""SELECT info FROM userdata WHERE UUID = {member.id}"""
-        async with self._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-        return json.decode(response) if response else response
+        """Select a user's data for every server"""
+        return await self.storage.get_user_guilds(member.id) or None
 
     async def user_update(self, member, data):
-        """Update a user's data for a specific server"""
-        jd = self.dump(data)
-        req = f"""UPDATE userdata
-        SET info = '{jd}'
-        WHERE UUID = {member.id}"""
-        async with self._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-        return json.decode(response) if response else response
+        """Update a user's data for every server given"""
+        for guild_id, value in data.items():
+            await self.update_user_record(member.id, int(guild_id), value)
 
     async def user_exists(self, member):
         """Check if a user has an entry in the db"""
-        req = f"""SELECT info FROM userdata WHERE UUID = {member.id}"""
-        async with self._conn.acquire() as connection:
-            return bool(await connection.fetchval(req))
+        await self.flush()
+        return bool(await self.storage.user_exists(member.id))
 
     async def add_user(self, member, data=None):
-        """Add a server to the users json, if the user doesnt exist user_insert to make one"""
+        """Add a server to the user's data if they don't have an entry for it yet"""
         if not data:
-            data = {member.guild.id: self.bot.default_udata}
-
-        if not await self.user_exists(member):
-            await self.user_insert(member, data)
+            data = self.bot.default_udata
+        if self.write_buffer is not None and self.write_buffer.get_user(member.id, member.guild.id) is not None:
             return
 
-        else:
-            values = await self.user_select(member)
+        version = await self.storage.add_user(member.id, member.guild.id, data)
+        if version is not None:
+            self.user_written((member.id, member.guild.id), data, version)
 
-        if not values:
-            await self.update_user_data(member, data)
+    async def update_user_record(self, user_id, guild_id, data):
+        if self.write_buffer is not None:
+            # Cached first, so nothing reads the older cached copy while the buffer flushes
+            self.user_written((user_id, guild_id), data)
+            await self.write_buffer.stage_user(user_id, guild_id, data)
+        else:
+            version = await self.storage.put_user(user_id, guild_id, data)
+            self.user_written((user_id, guild_id), data, version)
 
     async def update_user_data(self, member, data):
         """Update a user's server data"""
-        fs = await self.user_full_select(member)
-        if fs:
-            fs.update({str(member.guild.id): data})
-            await self.user_update(member, fs)
-        else:
-            await self.user_insert(member, data)
+        await self.update_user_record(member.id, member.guild.id, data)
+
+    async def update_user_fields(self, member, **fields):
+        """Update only the given fields of a user's server data"""
+        names = tuple(fields)
+        if any(name not in USER_COLUMNS for name in names):
+            raise KeyError(f"Unknown user fields {names}")
+
+        if self.write_buffer is not None:
+            data = await self.get_user_data(member, primary=True)
+            data.update(fields)
+            return await self.update_user_data(member, data)
+
+        await self.ensure_user(member)
+        data, version = await self.storage.update_user_fields(member.id, member.guild.id, fields)
+        self.user_written((member.id, member.guild.id), data, version)
+
+    async def mutate_user(self, member, mutate, retries=5):
+        """Change a user's server data with `mutate`, without losing concurrent changes to it.
+        `mutate` changes the data it's given in place and its return value is returned. If the user changed
+        since it was read, it's called again with the new data, so it mustn't do anything else."""
+        if self.write_buffer is not None:
+            # Buffered records only change in memory, nothing else can run between reading and staging them
+            data = await self.get_user_data(member, primary=True)
+            result = mutate(data)
+            await self.update_user_data(member, data)
+            return result
+
+        key = (member.id, member.guild.id)
+        for _ in range(retries):
+            data, version = await self.user_record(member, versioned=True)
+            data = data or copy.deepcopy(self.bot.default_udata)
+            result = mutate(data)
+            versions = await self.storage.write_conditional({key: (data, version)}, {})
+            if versions is not None:
+                self.user_written(key, data, versions[key])
+                return result
+            self.user_cache.pop(key)
+        raise VersionConflict(f"User {member.id} in {member.guild.id} kept changing")
+
+    async def user_records(self, guild_id, user_ids, primary=False):
+        """Get many users' data for a server, fetching the ones that aren't cached or buffered in one query.
+        Missing users' data is None. Passing primary fetches them from the primary database."""
+        def local(user_id):
+            key = (user_id, guild_id)
+            dirty = self.write_buffer.get_user(*key) if self.write_buffer is not None else None
+            if dirty is not None:
+                return copy.deepcopy(dirty)
+            response = self.user_cache.get(key)
+            return response if response is None else json.decode(response)
+
+        missing = [user_id for user_id in user_ids if (user_id, guild_id) not in self.user_cache and
+                   (self.write_buffer is None or self.write_buffer.get_user(user_id, guild_id) is None)]
+        fetched = dict()
+        if missing:
+            fetched = await self.storage.get_users(guild_id, missing, primary=primary)
+            for user_id in missing:
+                data, version = fetched.get(user_id, (None, None))
+                self.user_cache.set((user_id, guild_id), json.dumps(data), version)
+
+        # Nothing awaits from here on, so what's returned can be mutated and staged without losing changes
+        records = dict()
+        for user_id in user_ids:
+            data = local(user_id)
+            if data is None and (user_id, guild_id) not in self.user_cache:
+                data = fetched.get(user_id, (None, None))[0]
+            records[user_id] = data
+        return records
+
+    async def mutate_users(self, members, mutate, before=None):
+        """Change many users' server data with `mutate`, in a couple of queries per server rather than a few
+        per user. Returns {member: what mutate returned}, nothing is saved if any call raises.
+        before can give [(member, mutate)] to apply to a member's data first, for changes that differ per member."""
+        before = {(member.id, member.guild.id): change for member, change in before or ()}
+
+        def apply(user_id, guild_id, data):
+            change = before.get((user_id, guild_id))
+            if change is not None:
+                change(data)
+            return mutate(data)
+
+        guilds = dict()
+        for member in members:
+            guilds.setdefault(member.guild.id, dict())[member.id] = member
+
+        results = dict()
+        for guild_id, group in guilds.items():
+            user_ids = list(group)
+            if self.storage.legacy_users:
+                for member in group.values():
+                    await self.ensure_user(member)
+
+            if self.write_buffer is not None:
+                records = await self.user_records(guild_id, user_ids, primary=True)
+                users = dict()
+                for user_id, data in records.items():
+                    data = data or copy.deepcopy(self.bot.default_udata)
+                    results[group[user_id]] = apply(user_id, guild_id, data)
+                    users[(user_id, guild_id)] = data
+                for key, data in users.items():
+                    self.user_written(key, data)
+                await self.write_buffer.stage_many(users, {})
+            else:
+                written = await self.storage.mutate_users(
+                    guild_id, user_ids, lambda user_id, data, guild_id=guild_id: apply(user_id, guild_id, data))
+                for user_id, (data, version, result) in written.items():
+                    self.user_written((user_id, guild_id), data, version)
+                    results[group[user_id]] = result
+        return results
+
+    async def commit(self, users, sections, retries=5):
+        """Apply mutations to several user records and guild sections and save them all in one transaction,
+        retrying all of them if any record changed since it was read. users is a list of (member, mutate)
+        and sections of (guild, section, mutate), each mutate works like in `mutate_user`."""
+        versioned = self.write_buffer is None
+        for attempt in range(retries):
+            records = dict()
+            for member, _ in users:
+                records[(member.id, member.guild.id)] = await self.user_record(member, versioned, primary=True)
+            for guild, section, _ in sections:
+                records[(guild.id, section)] = await self.guild_section_record(guild, section, versioned)
+            if not versioned:
+                # Read again, now they're all cached nothing else can run until they're staged
+                for member, _ in users:
+                    records[(member.id, member.guild.id)] = await self.user_record(member)
+                for guild, section, _ in sections:
+                    records[(guild.id, section)] = await self.guild_section_record(guild, section)
+
+            for member, mutate in users:
+                data, version = records[(member.id, member.guild.id)]
+                if data is None:
+                    data = copy.deepcopy(self.bot.default_udata)
+                    records[(member.id, member.guild.id)] = data, version
+                mutate(data)
+            for guild, section, mutate in sections:
+                mutate(records[(guild.id, section)][0])
+
+            user_keys = {(member.id, member.guild.id) for member, _ in users}
+            section_keys = {(guild.id, section) for guild, section, _ in sections}
+            if not versioned:
+                for key in user_keys:
+                    self.user_written(key, records[key][0])
+                for key in section_keys:
+                    self.section_written(key, json.dumps(records[key][0]))
+                await self.write_buffer.stage_many({key: records[key][0] for key in user_keys},
+                                                   {key: records[key][0] for key in section_keys})
+                return
 
-    async def get_user_data(self, member):
-        """Get a user's data for a server"""
-        data = await self.user_select(member)
-        return data if data else copy.copy(self.bot.default_udata)
+            versions = await self.storage.write_conditional({key: records[key] for key in user_keys},
+                                                            {key: records[key] for key in section_keys})
+            if versions is None:
+                for key in user_keys:
+                    self.user_cache.pop(key)
+                for key in section_keys:
+                    self.guild_cache.pop(key)
+                continue
+
+            for key in user_keys:
+                self.user_written(key, records[key][0], versions[key])
+            for key in section_keys:
+                self.section_written(key, json.dumps(records[key][0]), versions[key])
+            return
+        raise VersionConflict("Records kept changing while committing")
+
+    async def get_user_data(self, member, primary=False):
+        """Get a user's data for a server, pass primary if it's going to be written back"""
+        data = await self.user_select(member, primary)
+        return data if data else copy.deepcopy(self.bot.default_udata)
+
+    async def read_user(self, member):
+        """Get a user's data for a server, read once per command, see `cogs.utils.snapshot`.
+        Only for reading, changes go through `mutate_user` and friends. Each call returns its own copy."""
+        snap = snapshot.current()
+        if snap is None:
+            return await self.get_user_data(member)
+        key = (member.id, member.guild.id)
+        if key not in snap.users:
+            snap.users[key] = await self.get_user_data(member)
+        return copy.deepcopy(snap.users[key])
 
     async def get_all_user_data(self, member):
         """Get a user's data for all servers"""
-        req = f"""SELECT info FROM userdata WHERE UUID = {member.id}"""
-        async with self._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-        return json.decode(response) if response else response
+        await self.flush()
+        return await self.user_full_select(member)
+
+    async def load_top(self, guild_id, board, n):
+        await self.flush()
+        return await self.storage.get_top(guild_id, board, n)
+
+    async def get_leaderboard(self, guild, board="money", n=10, present=None):
+        """Get the best n (user id, score) pairs of a server's board, see `cogs.utils.leaderboard`.
+        Passing present(user id) skips users it's false for, such as members who left,
+        reading further down the board until n are found or it runs out."""
+        if present is None:
+            return await self.leaderboards.top(self.load_top, guild.id, board, n)
+
+        fetch = 2 * n
+        while True:
+            top = await self.leaderboards.top(self.load_top, guild.id, board, fetch)
+            found = [(user_id, score) for user_id, score in top if present(user_id)]
+            if len(found) >= n or len(top) < fetch:
+                return found[:n]
+            fetch *= 4
 
     # Server functions
     ########################################################################
+    async def load_guild(self, guild, section=None):
+        """Load and cache a guild's sections, or only the given one, creating the guild if needed.
+        New guilds are split from their old servdata blob if they have one."""
+        sections = await self.storage.load_guild(guild.id, self.bot.default_servdata, section)
+        for name, (value, version) in sections.items():
+            # Buffered writes are newer than what's in the database
+            dirty = self.write_buffer.get_section(guild.id, name) if self.write_buffer is not None else None
+            if dirty is not None:
+                sections[name] = value, version = json.dumps(dirty), version
+            self.guild_cache.set((guild.id, name), value, version)
+        return sections
+
+    async def ensure_guild(self, guild):
+        """Make sure a guild's old blob has been split before writing one of its sections"""
+        if self.storage.legacy_guilds and (guild.id, "settings") not in self.guild_cache:
+            await self.load_guild(guild, "settings")
+
+    async def guild_section_record(self, guild, section, versioned=False):
+        """Get a single section of a guild's data and its row version, which is None if it isn't known.
+        Passing versioned skips cached data without a version."""
+        key = (guild.id, section)
+        response = self.guild_cache.get(key)
+        version = self.guild_cache.version(key)
+        if response is None and self.write_buffer is not None:
+            dirty = self.write_buffer.get_section(*key)
+            if dirty is not None:
+                return copy.deepcopy(dirty), version
+        if response is None or (versioned and version is None):
+            response, version = (await self.load_guild(guild, section)).get(section, ("{}", None))
+        return json.decode(response), version
+
+    async def get_guild_section(self, guild, section):
+        """Get a single section of a guild's data"""
+        return (await self.guild_section_record(guild, section))[0]
+
+    async def update_guild_section(self, guild, section, data):
+        """Replace a single section of a guild's data"""
+        await self.ensure_guild(guild)
+        if self.write_buffer is not None:
+            self.section_written((guild.id, section), json.dumps(data))
+            await self.write_buffer.stage_section(guild.id, section, data)
+        else:
+            version = await self.storage.put_section(guild.id, section, data)
+            self.section_written((guild.id, section), json.dumps(data), version)
+
+    async def mutate_guild_section(self, guild, section, mutate, retries=5):
+        """Change a single section of a guild's data with `mutate`, without losing concurrent changes to it.
+        Works like `mutate_user`."""
+        if self.write_buffer is not None:
+            data = await self.get_guild_section(guild, section)
+            result = mutate(data)
+            await self.update_guild_section(guild, section, data)
+            return result
+
+        key = (guild.id, section)
+        for _ in range(retries):
+            data, version = await self.guild_section_record(guild, section, versioned=True)
+            result = mutate(data)
+            versions = await self.storage.write_conditional({}, {key: (data, version)})
+            if versions is not None:
+                self.section_written(key, json.dumps(data), versions[key])
+                return result
+            self.guild_cache.pop(key)
+        raise VersionConflict(f"Section {section} of {guild.id} kept changing")
+
+    async def read_section(self, guild, section):
+        """Get a single section of a guild's data, read once per command like `read_user`"""
+        snap = snapshot.current()
+        if snap is None:
+            return await self.get_guild_section(guild, section)
+        key = (guild.id, section)
+        if key not in snap.sections:
+            snap.sections[key] = await self.get_guild_section(guild, section)
+        return copy.deepcopy(snap.sections[key])
+
+    async def get_guild_settings(self, guild):
+        """Get a guild's scalar settings, such as its language, currency and start money"""
+        return await self.get_guild_section(guild, "settings")
+
+    async def update_guild_settings(self, guild, **settings):
+        """Update the given guild settings, leaving the others as they are"""
+        if self.write_buffer is not None:
+            data = await self.get_guild_settings(guild)
+            data.update(settings)
+            return await self.update_guild_section(guild, "settings", data)
+
+        await self.ensure_guild(guild)
+        response, version = await self.storage.update_settings(guild.id, settings)
+        self.section_written((guild.id, "settings"), response, version)
+
     async def guild_insert(self, guild, data):
-        """Add a new guild to the db"""
-        jd = self.dump(data)
-        req = f"""INSERT INTO servdata (UUID, info) VALUES ({guild.id}, '{jd}')"""
-        async with self._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-        return json.decode(response) if response else response
+        """Add a new guild to the db, or overwrite an existing one"""
+        sections = split_guild_data(data)
+        if self.write_buffer is not None:
+            for section, value in sections.items():
+                await self.update_guild_section(guild, section, value)
+            return
+
+        versions = await self.storage.put_sections(guild.id, sections)
+        for section, version in versions.items():
+            self.section_written((guild.id, section), json.dumps(sections[section]), version)
 
     async def guild_select(self, guild):
         """Get a guild from the db"""
-        req = f"""SELECT info FROM servdata WHERE UUID = {guild.id}"""
-        async with self._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-        return json.decode(response) if response else response
+        sections = dict()
+        for section in GUILD_SECTIONS + ("settings",):
+            response = self.guild_cache.get((guild.id, section))
+            if response is None:
+                sections = {name: value for name, (value, _) in (await self.load_guild(guild)).items()}
+                break
+            sections[section] = response
+
+        data = json.decode(sections.get("settings", "{}"))
+        for section in GUILD_SECTIONS:
+            data[section] = json.decode(sections.get(section, "{}"))
+        return data
 
     async def guild_update(self, guild, data):
         """Update a guild"""
-        jd = self.dump(data)
-        req = f"""UPDATE servdata
-        SET info = '{jd}'
-        WHERE UUID = {guild.id}"""
-        async with self._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-        return json.decode(response) if response else response
+        await self.guild_insert(guild, data)
 
     async def add_guild(self, guild, data=None):
         """Add a guild to the db"""
-        values = await self.guild_select(guild)
-        if values:
-            return
-
-        if not data:
-            data = self.bot.default_servdata
-
-        await self.guild_insert(guild, data)
+        await self.load_guild(guild)
+        if data is not None:
+            await self.guild_insert(guild, data)
 
     async def update_guild_data(self, guild, data):
-        if await self.guild_select(guild):
-            await self.guild_update(guild, data)
-        else:
-            await self.guild_insert(guild, data)
+        await self.guild_insert(guild, data)
 
     async def get_guild_data(self, guild):
-        values = await self.guild_select(guild)
-        if values:
-            return values
-        else:
-            await self.guild_insert(guild, self.bot.default_servdata)
-            return await self.get_guild_data(guild)
+        return await self.guild_select(guild)
+
+    async def find_guild_data(self, guild):
+        """Get a guild's data like `get_guild_data`, but None instead of creating it if it has none"""
+        if all((guild.id, section) in self.guild_cache for section in GUILD_SECTIONS + ("settings",)):
+            return await self.guild_select(guild)
+        sections = {name: json.decode(value) for name, (value, _) in (await self.storage.get_guild(guild.id)).items()}
+        if not sections:
+            return None
+        if self.write_buffer is not None:
+            # Buffered writes are newer than what's in the database
+            for name in list(sections):
+                dirty = self.write_buffer.get_section(guild.id, name)
+                if dirty is not None:
+                    sections[name] = copy.deepcopy(dirty)
+
+        data = sections.get("settings", {})
+        for section in GUILD_SECTIONS:
+            data[section] = sections.get(section, {})
+        return data
 
     async def guild_item(self, guild, name: str):
-        req = f"""SELECT info ->> '{name}' FROM servdata WHERE UUID = {guild.id}"""
-        async with self._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-        return response if response else copy.copy(self.bot.default_servdata[name])
+        if name in GUILD_SECTIONS:
+            response = await self.get_guild_section(guild, name)
+        else:
+            response = (await self.get_guild_settings(guild)).get(name)
+        return response if response else copy.deepcopy(self.bot.default_servdata[name])
 
     async def user_item(self, member, name: str):
-        req = f"""SELECT info -> '{member.guild.id}' ->> '{name}' FROM userdata WHERE UUID = {member.id}"""
-        async with self._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-        return response if response else copy.copy(self.bot.default_udata[name])
+        response = (await self.read_user(member)).get(name)
+        return response if response else copy.deepcopy(self.bot.default_udata[name])
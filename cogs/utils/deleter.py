@@ -0,0 +1,52 @@
+import datetime
+
+import discord
+
+
+class MessageDeleter(object):
+    """Deletes messages in batches, one bulk delete per channel every window seconds instead of one call a message.
+    Discord only bulk deletes messages up to 14 days old, older ones are deleted one by one."""
+    max_batch = 100  # The most messages a bulk delete takes
+    max_age = datetime.timedelta(days=14) - datetime.timedelta(minutes=1)
+
+    def __init__(self, bot, window=1.0):
+        self.bot = bot
+        self.window = window
+        self.pending = dict()  # channel id: [messages]
+
+    async def delete(self, message):
+        queued = self.pending.get(message.channel.id)
+        if queued is None:
+            self.pending[message.channel.id] = [message]
+            self.bot.scheduler.call_later(self.window, self.flush, message.channel)
+        else:
+            queued.append(message)
+
+    async def flush(self, channel):
+        messages = self.pending.pop(channel.id, [])
+        oldest = datetime.datetime.utcnow() - self.max_age
+        recent = [message for message in messages if message.created_at > oldest]
+        for message in messages:
+            if message.created_at <= oldest:
+                await self.delete_one(message)
+
+        for i in range(0, len(recent), self.max_batch):
+            batch = recent[i:i + self.max_batch]
+            try:
+                await channel.delete_messages(batch)
+            except discord.HTTPException:
+                # One bad message fails the whole batch, fall back to deleting them one at a time
+                for message in batch:
+                    await self.delete_one(message)
+
+    @staticmethod
+    async def delete_one(message):
+        try:
+            await message.delete()
+        except discord.HTTPException:
+            pass
+
+    async def close(self):
+        """Delete everything still waiting"""
+        for messages in list(self.pending.values()):
+            await self.flush(messages[0].channel)
@@ -0,0 +1,103 @@
+from collections import defaultdict
+import asyncio
+import logging
+
+import discord
+
+# k * k % 10 for k % 10, and their running sums, so the squares' remainders can be summed without a loop
+_RESIDUES = [k * k % 10 for k in range(10)]
+_RESIDUE_SUMS = [sum(_RESIDUES[:k]) for k in range(10)]
+
+
+def exp_needed(level):
+    """The experience needed to go from a level to the next, 0.1x^2+5x+4 rounded down"""
+    return level * level // 10 + 5 * level + 4
+
+
+def total_exp(level):
+    """The experience needed to reach a level from level 0, the sum of `exp_needed` in closed form"""
+    squares = (level - 1) * level * (2 * level - 1) // 6
+    residues = 45 * (level // 10) + _RESIDUE_SUMS[level % 10]
+    return (squares - residues) // 10 + 5 * level * (level - 1) // 2 + 4 * level
+
+
+def level_up(level, exp):
+    """Level up for as long as exp is more than the next level needs, returns the new (level, exp)"""
+    target = total_exp(level) + exp
+    if exp <= exp_needed(level):
+        return level, exp
+    # total_exp(x) is more than x^3 / 30, so the new level is below hi
+    lo, hi = level + 1, int((30 * target) ** (1 / 3)) + 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if total_exp(mid) < target:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo, target - total_exp(lo)
+
+
+class ExpAccumulator(object):
+    """Tallies the experience members earn from commands and gives it to them in batches every interval,
+    so a member using many commands is written once per interval rather than once per command.
+    Members who level up get a reaction on the last command message they sent."""
+
+    def __init__(self, bot, interval=5.0):
+        self.bot = bot
+        self.interval = interval
+        self.pending = dict()  # (guild id, user id): [member, exp, message]
+        self._task = None
+
+    def add(self, member, exp, message=None):
+        key = (member.guild.id, member.id)
+        entry = self.pending.get(key)
+        if entry is None:
+            self.pending[key] = [member, exp, message]
+        else:
+            entry[0] = member
+            entry[1] += exp
+            entry[2] = message or entry[2]
+
+    def start(self):
+        self._task = self.bot.loop.create_task(self.run())
+
+    async def close(self):
+        """Stop the periodic flushes and give out anything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Failed to give out experience")
+
+    async def flush(self):
+        pending, self.pending = self.pending, dict()
+        # Members earning the same amount share one mutation, `Database.mutate_users` splits them by guild
+        groups = defaultdict(list)
+        for member, exp, message in pending.values():
+            groups[exp].append(member)
+
+        levelled = []
+        for exp, members in groups.items():
+            try:
+                levels = await self.bot.di.add_exp_many(members, exp)
+            except Exception:
+                logging.exception("Failed to give out experience")
+                for member in members:
+                    self.add(member, exp, pending[(member.guild.id, member.id)][2])
+                continue
+            levelled.extend(member for member, level in levels.items() if level is not None)
+
+        for member in levelled:
+            message = pending[(member.guild.id, member.id)][2]
+            if message is not None:
+                try:
+                    await message.add_reaction("\u23EB")
+                except discord.HTTPException:
+                    pass
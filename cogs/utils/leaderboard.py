@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from bisect import bisect_left, insort
+
+# The user fields each leaderboard is ranked by, highest first
+BOARDS = {
+    "money": ("money",),
+    "level": ("level", "exp"),
+}
+
+
+def score(board, data):
+    """Get a user's score on a board from their server data"""
+    return tuple(data.get(field) or 0 for field in BOARDS[board])
+
+
+class TopK(object):
+    """The `size` best (score, user id) pairs of a guild's board, best first"""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = []  # (negated score, user id), sorted so the best is first
+        self.scores = dict()
+        self.complete = False  # Whether every user of the guild is on the board
+        self.stale = False  # Whether the board lost an entry it can't replace and has to be reloaded
+        self.loaded = False
+        self.pending = []
+
+    @staticmethod
+    def entry(user_id, score):
+        return tuple(-x for x in score), user_id
+
+    def load(self, rows):
+        """Fill the board from the storage's (user id, score) rows, applying updates made while loading"""
+        self.entries = sorted(self.entry(user_id, score) for user_id, score in rows)
+        self.scores = dict(rows)
+        self.complete = len(rows) < self.size
+        self.loaded = True
+        pending, self.pending = self.pending, []
+        for user_id, score in pending:
+            self.update(user_id, score)
+
+    def update(self, user_id, score):
+        if not self.loaded:
+            self.pending.append((user_id, score))
+            return
+
+        old = self.scores.pop(user_id, None)
+        if old is not None:
+            entry = self.entry(user_id, old)
+            del self.entries[bisect_left(self.entries, entry)]
+
+        entry = self.entry(user_id, score)
+        if self.complete or (self.entries and entry < self.entries[-1]):
+            insort(self.entries, entry)
+            self.scores[user_id] = score
+            if len(self.entries) > self.size:
+                _, dropped = self.entries.pop()
+                del self.scores[dropped]
+                self.complete = False
+        elif old is not None:
+            # Someone fell off the board, whoever replaces them is only known to the storage
+            self.stale = True
+
+    def top(self, n):
+        """Get the best n (user id, score) pairs, in O(n)"""
+        return [(user_id, tuple(-x for x in score)) for score, user_id in self.entries[:n]]
+
+
+class Leaderboards(object):
+    """Top-K boards for the guilds that have been asked for one recently, loaded from the storage's
+    index once and kept up to date as user records are written"""
+
+    def __init__(self, size=50, max_boards=1000):
+        self.size = size
+        self.max_boards = max_boards
+        self.boards = OrderedDict()  # (guild id, board): TopK, least recently used first
+
+    def update(self, user_id, guild_id, data):
+        """Update a user's place on their guild's boards after their data was written"""
+        if not data:
+            return
+        for board in BOARDS:
+            topk = self.boards.get((guild_id, board))
+            if topk is not None:
+                topk.update(user_id, score(board, data))
+
+    def drop(self, guild_id):
+        """Reload a guild's boards next time, after its users were changed somewhere they can't be followed"""
+        for board in BOARDS:
+            topk = self.boards.get((guild_id, board))
+            if topk is not None:
+                topk.stale = True
+
+    def drop_all(self):
+        """Reload every board next time"""
+        for topk in self.boards.values():
+            topk.stale = True
+
+    async def top(self, load, guild_id, board, n=10):
+        """Get the best n (user id, score) pairs of a guild's board.
+        load(guild id, board, n) gets the best n pairs from the storage's index"""
+        if n > self.size:
+            return await load(guild_id, board, n)
+
+        key = (guild_id, board)
+        topk = self.boards.get(key)
+        if topk is not None and not topk.loaded:
+            # Another command is loading it
+            return await load(guild_id, board, n)
+        if topk is None or topk.stale:
+            topk = self.boards[key] = TopK(self.size)
+            while len(self.boards) > self.max_boards:
+                self.boards.popitem(last=False)
+            try:
+                topk.load(await load(guild_id, board, self.size))
+            except Exception:
+                # Left unloaded it would never be retried
+                if self.boards.get(key) is topk:
+                    del self.boards[key]
+                raise
+        self.boards[key] = topk
+        self.boards.move_to_end(key)
+        return topk.top(n)
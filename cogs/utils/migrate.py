@@ -0,0 +1,84 @@
+"""Online migrations for the bot's database, safe to run while the bot is up.
+
+Usage: python -m cogs.utils.migrate [batch size] [delay between batches]
+"""
+import asyncio
+import sys
+
+import asyncpg
+
+from .backends import DSN, SCHEMA, STATEMENTS, PostgresStorage, user_columns, split_guild_data
+from .data import default_user
+
+MIGRATION_UPSERT = """INSERT INTO migrations (name, position, done) VALUES ($1, $2, $3)
+    ON CONFLICT (name) DO UPDATE SET position = EXCLUDED.position, done = EXCLUDED.done"""
+BATCHES = {
+    "members": """SELECT UUID, info FROM userdata WHERE UUID > $1 ORDER BY UUID LIMIT $2""",
+    "guild_sections": """SELECT UUID, info FROM servdata WHERE UUID > $1 ORDER BY UUID LIMIT $2""",
+}
+
+
+def expand_userdata(uuid, info):
+    """Split an old userdata blob into one members row per server"""
+    for guild_id, data in (info or {}).items():
+        if str(guild_id).isdigit() and isinstance(data, dict):
+            yield (uuid, int(guild_id), *user_columns(data, default_user))
+
+
+def expand_servdata(uuid, info):
+    """Split an old servdata blob into one guild_sections row per section"""
+    for section, data in split_guild_data(info or {}).items():
+        yield (uuid, section, data)
+
+
+async def migrate(pool, name, expand, statement, batch_size=500, delay=0.1):
+    """Copy every old blob into the new table in batches.
+    Rows the bot has already written are left alone, and progress is saved after every batch
+    so the migration can be stopped and resumed."""
+    row = await pool.fetchrow(STATEMENTS["migration_select"], name)
+    position, done = (row["position"], row["done"]) if row else (0, False)
+    copied = 0
+
+    while not done:
+        async with pool.acquire() as connection:
+            rows = await connection.fetch(BATCHES[name], position, batch_size)
+            async with connection.transaction():
+                if rows:
+                    records = [r for x in rows for r in expand(x["uuid"], x["info"])]
+                    await connection.executemany(STATEMENTS[statement], records)
+                    copied += len(records)
+                    position = rows[-1]["uuid"]
+                done = len(rows) < batch_size
+                await connection.execute(MIGRATION_UPSERT, name, position, done)
+
+        print(f"Migrated {name} up to {position}, {copied} rows copied")
+        await asyncio.sleep(delay)
+
+    return copied
+
+
+async def migrate_users(pool, batch_size=500, delay=0.1):
+    return await migrate(pool, "members", expand_userdata, "user_migrate", batch_size, delay)
+
+
+async def migrate_guilds(pool, batch_size=500, delay=0.1):
+    return await migrate(pool, "guild_sections", expand_servdata, "guild_section_insert", batch_size, delay)
+
+
+async def main(batch_size=500, delay=0.1):
+    connection = await asyncpg.connect(**DSN)
+    try:
+        await connection.execute(SCHEMA)
+    finally:
+        await connection.close()
+
+    async with asyncpg.create_pool(**DSN, init=PostgresStorage.init_connection) as pool:
+        await migrate_users(pool, batch_size, delay)
+        await migrate_guilds(pool, batch_size, delay)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.get_event_loop().run_until_complete(
+        main(int(args[0]) if args else 500, float(args[1]) if len(args) > 1 else 0.1)
+    )
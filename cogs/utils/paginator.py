@@ -0,0 +1,144 @@
+import asyncio
+
+import discord
+
+from .translation import _
+
+
+class Paginator(object):
+    """Shows pages in an embed, turned by the command's author with reactions.
+    Pages are rendered when first shown and kept for turning back to them. Presses made while an edit is
+    in flight are coalesced into one edit to the page the author ended on, at most one edit every delay seconds.
+    render(index) gives a page's (description, fields), description None to keep the shared one,
+    or None if there's no such page, when count isn't known up front."""
+    emotes = ("\u2B05", "\u27A1", "\u274C")
+
+    def __init__(self, ctx, render, count=None, timeout=80, delay=1.0, emotes=None, title=None, description=None,
+                 author=None, author_url=None, thumbnail=None, footer=None):
+        self.ctx = ctx
+        self.bot = ctx.bot
+        self.render = render
+        self.count = count
+        self.timeout = timeout
+        self.delay = delay
+        if emotes is not None:
+            self.emotes = emotes
+        self.title = title
+        self.description = description
+        self.author = author
+        self.author_url = author_url
+        self.thumbnail = thumbnail
+        self.footer = footer
+
+        self.pages = dict()  # index: rendered embed
+        self.index = 0  # The page the author asked for
+        self.shown = 0  # The page the message shows
+        self.message = None
+        self._editing = None
+
+    async def page(self, index):
+        if index not in self.pages:
+            rendered = await self.render(index)
+            if rendered is None:
+                return None
+            description, fields = rendered
+            embed = discord.Embed(title=self.title,
+                                  description=self.description if description is None else description)
+            if self.author is not None:
+                embed.set_author(name=self.author, icon_url=self.author_url or discord.Embed.Empty)
+            if self.thumbnail:
+                embed.set_thumbnail(url=self.thumbnail)
+            if self.footer:
+                embed.set_footer(text=self.footer)
+            for name, value in fields:
+                embed.add_field(name=name, value=value)
+            self.pages[index] = embed
+        return self.pages[index]
+
+    async def run(self):
+        ctx = self.ctx
+        self.message = await ctx.send(embed=await self.page(0))
+        # Listen for presses while the reactions are still being added
+        reacting = self.bot.loop.create_task(self.add_reactions())
+        try:
+            while True:
+                try:
+                    r, u = await self.bot.waiters.reaction(self.message, timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    await ctx.send(await _(ctx, "Timed out! Try again"))
+                    await self.message.delete()
+                    return
+
+                if u == ctx.me:
+                    continue
+
+                if u != ctx.author or r.emoji not in self.emotes:
+                    try:
+                        await self.message.remove_reaction(r.emoji, u)
+                    except:
+                        pass
+                    continue
+
+                if r.emoji == self.emotes[0]:
+                    self.turn(-1)
+                elif r.emoji == self.emotes[1]:
+                    self.turn(1)
+                else:
+                    await self.message.delete()
+                    await ctx.send(await _(ctx, "Closing"))
+                    return
+
+                try:
+                    await self.message.remove_reaction(r.emoji, u)
+                except:
+                    pass
+        finally:
+            reacting.cancel()
+            if self._editing is not None:
+                self._editing.cancel()
+            self.pages.clear()
+
+    async def add_reactions(self):
+        emotes = self.emotes if self.count != 1 else self.emotes[2:]
+        for emote in emotes:
+            await self.message.add_reaction(emote)
+
+    def turn(self, step):
+        index = max(self.index + step, 0)
+        if self.count is not None:
+            index = min(index, self.count - 1)
+        self.index = index
+        if self._editing is None and self.index != self.shown:
+            self._editing = self.bot.loop.create_task(self.edit())
+
+    async def edit(self):
+        try:
+            while self.index != self.shown:
+                index = self.index
+                embed = await self.page(index)
+                if embed is None:  # Past the last page
+                    self.count = index
+                    self.index = min(self.index, index - 1)
+                    continue
+                await self.message.edit(embed=embed)
+                self.shown = index
+                await asyncio.sleep(self.delay)
+        except discord.HTTPException:
+            pass
+        finally:
+            self._editing = None
+
+
+def split_field(name, value, limit=500):
+    """Split a field's lines into fields of at most limit characters"""
+    fields = []
+    part = []
+    size = 0
+    for line in value.split("\n"):
+        if part and size + len(line) > limit:
+            fields.append("\n".join(part))
+            part, size = [], 0
+        part.append(line)
+        size += len(line) + 1
+    fields.append("\n".join(part))
+    return [(name if i == 0 else f"{name} continued", field) for i, field in enumerate(fields)]
@@ -0,0 +1,134 @@
+from itertools import count
+from time import time
+from uuid import uuid4
+import asyncio
+import heapq
+import logging
+
+
+class Timer(object):
+    """An action waiting in the `Scheduler`, pass it to `Scheduler.cancel` to cancel it"""
+    __slots__ = ("due", "callback", "args", "kwargs", "name", "id", "done")
+
+    def __init__(self, due, callback, args=(), kwargs=None, name=None, id=None):
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.name = name  # The registered handler's name, for saved actions
+        self.id = id  # Set if the action is saved to storage
+        self.done = False
+
+
+class Scheduler(object):
+    """Runs the bot's delayed actions off one heap, so a pending action is a heap entry rather than a sleeping task.
+    Actions with a registered name can be saved to storage, each worker schedules its saved actions again when
+    it restarts. Saved actions are deleted once they've run, so one interrupted mid-run runs again."""
+
+    def __init__(self, bot, worker=0):
+        self.bot = bot
+        self.worker = worker
+        self.heap = []  # (due, sequence, timer)
+        self.sequence = count()
+        self.handlers = dict()  # name: (handler, restore)
+        self.pending = 0
+        self.fired = 0
+        self.failed = 0
+        self.lag = 0.0  # How late the last action started
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def register(self, name, handler, restore=None):
+        """Run actions scheduled under this name with handler(**args).
+        restore(timer) is called for each saved action loaded after a restart, to rebuild any state kept for it"""
+        self.handlers[name] = (handler, restore)
+
+    def call_later(self, delay, callback, *args):
+        """Call a coroutine function with args after delay seconds, not saved"""
+        return self.push(Timer(time() + delay, callback, args))
+
+    async def schedule(self, delay, name, save=False, **args):
+        """Run the handler registered under name with args after delay seconds.
+        If saved the args must be JSON serializable, and `save` has to be called again after changing them"""
+        timer = Timer(time() + delay, self.handlers[name][0], kwargs=args, name=name,
+                      id=uuid4().hex if save else None)
+        if save:
+            await self.save(timer)
+        return self.push(timer)
+
+    async def save(self, timer):
+        await self.bot.db.storage.save_action(timer.id, self.worker, timer.due, timer.name, timer.kwargs)
+
+    def push(self, timer):
+        heapq.heappush(self.heap, (timer.due, next(self.sequence), timer))
+        self.pending += 1
+        if self.heap[0][2] is timer:
+            self._wakeup.set()
+        return timer
+
+    def cancel(self, timer):
+        if timer.done:
+            return
+        timer.done = True
+        self.pending -= 1
+        if timer.id is not None:
+            self.bot.loop.create_task(self.delete(timer))
+        # Cancelled timers are left in the heap until they come up, unless they make up most of it
+        if len(self.heap) > 2 * self.pending + 64:
+            self.heap = [entry for entry in self.heap if not entry[2].done]
+            heapq.heapify(self.heap)
+
+    async def delete(self, timer):
+        try:
+            await self.bot.db.storage.delete_action(timer.id)
+        except Exception:
+            logging.exception(f"Failed to delete scheduled action {timer.name}")
+
+    async def start(self):
+        for id, due, name, args in await self.bot.db.storage.load_actions(self.worker):
+            if name not in self.handlers:
+                logging.warning(f"No handler for the saved action {name}")
+                continue
+            handler, restore = self.handlers[name]
+            timer = self.push(Timer(due, handler, kwargs=args, name=name, id=id))
+            if restore is not None:
+                restore(timer)
+        self._task = self.bot.loop.create_task(self.run())
+
+    async def close(self):
+        """Stop running actions, saved ones are run after the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            self._wakeup.clear()
+            now = time()
+            while self.heap and self.heap[0][0] <= now:
+                due, sequence, timer = heapq.heappop(self.heap)
+                if timer.done:
+                    continue
+                timer.done = True
+                self.pending -= 1
+                self.lag = now - due
+                self.bot.loop.create_task(self.fire(timer))
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.heap[0][0] - now if self.heap else None)
+            except asyncio.TimeoutError:
+                pass
+
+    async def fire(self, timer):
+        try:
+            await timer.callback(*timer.args, **timer.kwargs)
+            self.fired += 1
+        except Exception:
+            self.failed += 1
+            logging.exception(f"Scheduled action {timer.name or timer.callback} failed")
+        if timer.id is not None:
+            await self.delete(timer)
+
+    def stats(self):
+        return dict(pending=self.pending, fired=self.fired, failed=self.failed, lag=self.lag)
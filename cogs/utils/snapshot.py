@@ -0,0 +1,36 @@
+import asyncio
+import weakref
+
+try:
+    current_task = asyncio.current_task
+except AttributeError:  # Python 3.6
+    current_task = asyncio.Task.current_task
+
+
+class Snapshot(object):
+    """The decoded guild sections and user records read while handling one command, so each is read once.
+    Records the command writes are dropped so it reads them again, other commands' writes are only seen by
+    their next command."""
+
+    def __init__(self):
+        self.sections = dict()  # (guild id, section): data
+        self.users = dict()  # (user id, guild id): data
+
+
+# The snapshot of the command each task is running, tasks drop out once they're done
+_snapshots = weakref.WeakKeyDictionary()
+
+
+def bind(snapshot):
+    """Use a snapshot for the rest of the current task"""
+    _snapshots[current_task()] = snapshot
+
+
+def unbind():
+    _snapshots.pop(current_task(), None)
+
+
+def current():
+    """Get the current task's snapshot, or None outside of a command"""
+    task = current_task()
+    return _snapshots.get(task) if task is not None else None
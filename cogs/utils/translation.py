@@ -1,15 +1,51 @@
+from collections import defaultdict
+
+
+class Translations(object):
+    """The translation catalog compiled into a template table per language, each template split around "dollars"
+    so the guild's currency is joined in without searching the string.
+    Also keeps every guild's (language, currency), forgotten when either is changed."""
+
+    def __init__(self, bot, catalog):
+        self.bot = bot
+        self.tables = defaultdict(dict)  # language: {english: template}
+        for text, languages in catalog.items():
+            for lang, translated in languages.items():
+                self.tables[lang][text] = tuple(translated.split("dollars"))
+        self.untranslated = dict()  # english: template, for English and strings missing from a language
+        self.locales = dict()  # guild id: (language, currency)
+
+    def template(self, lang, text):
+        template = self.tables[lang].get(text) if lang != "en" and lang in self.tables else None
+        if template is None:
+            template = self.untranslated.get(text)
+            if template is None:
+                template = self.untranslated[text] = tuple(text.split("dollars"))
+        return template
+
+    async def locale(self, guild):
+        locale = self.locales.get(guild.id)
+        if locale is None:
+            gd = await self.bot.db.read_section(guild, "settings")
+            locale = self.locales[guild.id] = gd.get("lang", "en"), gd.get("currency", "dollars")
+        return locale
+
+    def forget(self, guild):
+        """Drop a guild's cached language and currency after either changed"""
+        self.locales.pop(guild.id, None)
+
+    async def translate(self, guild, *texts):
+        """Translate several strings for a guild at once"""
+        if guild is None:
+            return list(texts)
+        lang, currency = await self.locale(guild)
+        return [currency.join(self.template(lang, text)) for text in texts]
+
+
 async def _(ctx, translation):
-    if ctx.guild is not None:
-        gd = await ctx.bot.db.get_guild_data(ctx.guild)
-        lang = gd.get("lang", "en")
-        currency = gd.get("currency", "dollars")
-        if lang == "en":
-            return translation.replace("dollars", currency)
-
-        try:
-            translation = ctx.bot.translations[translation][lang]
-            return translation.replace("dollars", currency)
-        except:
-            return translation.replace("dollars", currency)
-
-    return translation
+    return (await ctx.bot.translations.translate(ctx.guild, translation))[0]
+
+
+async def _many(ctx, *translations):
+    """Translate several strings in one go, returning them as a list"""
+    return await ctx.bot.translations.translate(ctx.guild, *translations)
@@ -0,0 +1,62 @@
+from collections import defaultdict
+import asyncio
+
+
+class Waiters(object):
+    """Routes message and reaction events to the commands waiting on them, in place of `Bot.wait_for`.
+    Waiters are indexed by what they wait on, reactions by message id and messages by channel id and author id,
+    so each event only runs the checks of the waiters that could match it rather than every open check."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.reactions = defaultdict(list)  # message id: [(future, check)]
+        self.messages = defaultdict(list)  # (channel id, author id or None for anyone): [(future, check)]
+
+    async def message(self, channel, author=None, check=None, timeout=None):
+        """Wait for a message sent in a channel, by author if given, passing check(message) if given.
+        Raises asyncio.TimeoutError like `Bot.wait_for`"""
+        key = (channel.id, author.id if author is not None else None)
+        return await self.wait(self.messages, key, check, timeout)
+
+    async def reaction(self, message, check=None, timeout=None):
+        """Wait for a reaction added to a message passing check(reaction, user) if given, returns (reaction, user)"""
+        return await self.wait(self.reactions, message.id, check, timeout)
+
+    async def wait(self, index, key, check, timeout):
+        future = self.bot.loop.create_future()
+        waiter = (future, check)
+        index[key].append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            waiters = index.get(key)
+            if waiters is not None:
+                waiters.remove(waiter)
+                if not waiters:
+                    del index[key]
+
+    def message_sent(self, message):
+        channel_id = message.channel.id
+        self.dispatch(self.messages, (channel_id, message.author.id), message)
+        self.dispatch(self.messages, (channel_id, None), message)
+
+    def reaction_added(self, reaction, user):
+        self.dispatch(self.reactions, reaction.message.id, reaction, user)
+
+    @staticmethod
+    def dispatch(index, key, *args):
+        waiters = index.get(key)
+        if not waiters:
+            return
+        result = args[0] if len(args) == 1 else args
+        for future, check in waiters:
+            if future.done():
+                continue
+            try:
+                if check is None or check(*args):
+                    future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+
+    def __len__(self):
+        return sum(map(len, self.messages.values())) + sum(map(len, self.reactions.values()))
@@ -11,6 +11,8 @@ from kyoukai.asphalt import HTTPRequestContext, Response
 from werkzeug.exceptions import HTTPException
 from werkzeug.utils import redirect
 
+from cogs.utils.data import get_member
+
 try:
     import uvloop
 
@@ -25,7 +27,7 @@ except ImportError:
 
 example_post = {
     "bot_id": 521303012233183232,
-    "to_bot": Thunder The Bot",
+    "to_bot": "Thunder The Bot",
     "amount": 5000,
     "user_id": 477463812786618388,
     "server_id": 528115053736493086
@@ -60,7 +62,7 @@ register = {
 class API(Kyoukai):
     def __init__(self, bot, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.pool = None
+        self.storage = None
 
         with open("pyhtml/auth", 'r') as af:
             self.client_id, self.client_secret = json.loads(af.read())
@@ -84,39 +86,22 @@ class API(Kyoukai):
         with open("pyhtml/guild.html") as _rf:
             self.guild_html = _rf.read()
 
-    async def host(self):  # Start the connection to the DB and then start the Kyoukai server
-        await self.bot.db.connect()
+    async def host(self):  # Start the Kyoukai server, once the bot has connected to the DB
         await self.connect()
         # asyncio.ensure_future(eval.repl(self))
         await self.start('0.0.0.0', 1996)
 
     async def connect(self):
-        db = "pokerpg"  # "discoin"
-        self.pool = self.bot.db._conn
+        self.storage = self.bot.db.storage
 
     async def get_botdata(self, snowflake: int):
-        async with self.pool.acquire() as connection:
-            response = await connection.fetch(
-                f"""SELECT * FROM botdata WHERE id = {snowflake};"""
-            )
-
-        return response
+        return await self.storage.get_botdata(snowflake)
 
     async def get_userdata(self, snowflake: int):
-        async with self.pool.acquire() as connection:
-            response = await connection.fetchval(
-                f"""SELECT info FROM userdata WHERE UUID={snowflake};"""
-            )
-
-        return json.loads(response)
+        return await self.bot.db.get_all_user_data(discord.Object(int(snowflake)))
 
     async def get_serverdata(self, snowflake: int):
-        async with self.pool.acquire() as connection:
-            response = await connection.fetchval(
-                f"""SELECT info FROM servdata WHERE UUID={snowflake};"""
-            )
-
-        return json.loads(response)
+        return await self.bot.db.find_guild_data(discord.Object(int(snowflake)))
 
 
 def makepaths(server):
@@ -195,16 +180,21 @@ def makepaths(server):
                                                      "Authorization": f"Bearer {token}",
                                                  })).json()
 
-        guild = server.bot.get_guild(guild_id)
-
         if "code" in guilds:
             return Response(guilds["message"], status=guilds["code"])
 
-        if str(guild_id) not in (g["id"] for g in guilds):
+        guild_info = next((g for g in guilds if g["id"] == str(guild_id)), None)
+        if guild_info is None:
             return Response(status=403)
 
+        # The guild may be run by another worker of the cluster, its data is read by id either way
+        guild = server.bot.get_guild(guild_id)
+        guild_ref = guild or discord.Object(id=guild_id)
+
         try:
             guild_data = await server.get_serverdata(guild_id)
+            if guild_data is None:
+                return Response(status=403)
             user_data = (await server.get_userdata(medata["id"]))[str(guild_id)]
         except:
             import traceback
@@ -218,16 +208,15 @@ def makepaths(server):
         fmap = map(lambda x: f"{x[0]} x{x[1]}", sorted(user_data["items"].items()))
         inventory = "\n".join(fmap)
 
-        req = f"""SELECT (UUID, info->'{guild_id}'->>'money') FROM userdata;"""
-        async with server.pool.acquire() as connection:
-            resp = await connection.fetch(req)
-
-        users = [(discord.utils.get(guild.members, id=int(x["row"][0])), x["row"][1]) for x in resp if
-                 (len(x["row"]) == 2) and (x["row"][1] is not None)]
-        users = [x for x in users if x[0]]
-        users.sort(key=lambda x: -float(x[1]))
+        if guild is not None:
+            resp = await server.bot.db.get_leaderboard(guild, "money", 11,
+                                                       present=lambda user_id: get_member(guild, user_id))
+            users = [(get_member(guild, user_id), money) for user_id, (money,) in resp]
+        else:
+            resp = await server.bot.db.get_leaderboard(guild_ref, "money", 11)
+            users = [(server.bot.get_user(user_id) or user_id, money) for user_id, (money,) in resp]
 
-        currency = await server.bot.di.get_currency(guild)
+        currency = await server.bot.di.get_currency(guild_ref)
         baltop = "\n".join(f"<li> {y[0]} {y[1]} {currency}</li>" for y in users[:11])
         characters = "\n".join(f"<li>{name}</li>" for name, obj in guild_data["characters"].items() if obj[2] == str(medata["id"]))
 
@@ -255,7 +244,7 @@ def makepaths(server):
             market=None,
             lotteries=None,
             hubbutton=hubbutton,
-            guildname=guild.name,
+            guildname=guild_info["name"],
         )
         return as_html(html, code=200)
 
@@ -272,54 +261,40 @@ def makepaths(server):
         if "code" in js:
             return Response(js["message"], status=js["code"])
 
-        async with server.pool.acquire() as connection:
-            exists = await connection.fetch(
-                f"""SELECT * FROM userdata WHERE user_id = {js['id']};"""
-            )
-
-            if exists:
-                logging.info(f"Received request to view user info for {js['id']}")
-                js = {
-                    "user_id": js["id"],
-                    "bots": exists[0]["bots"],
-                }
-            else:
-                logging.info(f"Creating new database entry for user {js['id']}")
-                token = secrets.token_urlsafe(48)
-
-                await connection.fetch(
-                    f"""INSERT INTO userdata VALUES (
-                        {js["id"]},
-                        ARRAY[]::bigint[],
-                        '{token}',
-                        0
-                    );"""
-                )
-
-                js = {
-                    "user_id": js["id"],
-                    "bots": [],
-                    "token": token,
-                }
+        exists = await server.storage.get_api_user(int(js['id']))
+
+        if exists:
+            logging.info(f"Received request to view user info for {js['id']}")
+            js = {
+                "user_id": js["id"],
+                "bots": exists["bots"],
+            }
+        else:
+            logging.info(f"Creating new database entry for user {js['id']}")
+            token = secrets.token_urlsafe(48)
+
+            await server.storage.add_api_user(int(js["id"]), token)
+
+            js = {
+                "user_id": js["id"],
+                "bots": [],
+                "token": token,
+            }
 
         return as_json(js, code=200)
 
     @server.route("/user/<int:guild>/<int:user>/", methods=["GET"])
     async def getuser(ctx: HTTPRequestContext, guild: int, user: int):
-        req = f"""SELECT info FROM userdata WHERE UUID = {user}"""
-        async with server.bot.db._conn.acquire() as connection:
-            response = await connection.fetchval(req)
-        if response:
-            return as_json(json.decode(response)[str(int(guild))], code=200)
+        response = await server.get_userdata(user)
+        if response and str(guild) in response:
+            return as_json(response[str(int(guild))], code=200)
         return Response(status=403)
 
     @server.route("/guild/<int:guild>/", methods=["GET"])
     async def getguild(ctx: HTTPRequestContext, guild: int):
-        req = f"""SELECT info FROM servdata WHERE UUID = {guild}"""
-        async with server.bot.db._conn.acquire() as connection:
-            response = await connection.fetchval(req)
+        response = await server.get_serverdata(guild)
         if response:
-            return as_json(json.decode(response), code=200)
+            return as_json(response, code=200)
         return Response(status=403)
 
     @server.route("/", methods=["GET"])
@@ -355,22 +330,16 @@ def makepaths(server):
                                          response=Response("Failed to fetch info!", status=401))
                 token = ctx.request.headers["Authorization"]  # The user token
                 snowflake = int(snowflake)  # The bot snowflake
-                req = f"""SELECT * FROM userdata WHERE token = '{token.replace("'", "''")}';"""
-                async with server.pool.acquire() as connection:
-                    response = await connection.fetch(req)  # Get bots and webhook / gather type
+                response = await server.storage.get_api_user(token=token)  # Get bots and webhook / gather type
                 if response:
-                    bots, type = response[0]["bots"], response[0]["type"]
+                    bots, type = response["bots"], response["type"]
                     if snowflake not in bots:  # That bot is not associated with that token
                         return HTTPException("That snowflake is not valid!",
                                              Response("Failed to fetch info!", status=401))
 
-                    async with server.pool.acquire() as connection:
-                        name = await connection.fetchval(
-                            f"""SELECT name FROM botdata WHERE id = {snowflake};"""
-                        )  # Get the bot's name
-                        url = await connection.fetchval(
-                            f"""SELECT url FROM botdata WHERE name = '{ctx.request.form["to_bot"].replace("'", "''")}';"""
-                        )  # Get the URL of the bot we're sending to
+                    name = await server.storage.get_bot_name(snowflake)  # Get the bot's name
+                    # Get the URL of the bot we're sending to
+                    url = await server.storage.get_bot_url(ctx.request.form["to_bot"])
                     if url is None:  # That bot is not in our database!
                         return HTTPException("That is an invalid bot!",
                                              response=Response("Failed to fetch info!", status=400))
@@ -0,0 +1,36 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+for requirement in ("discord", "asyncpg", "ujson", "recordclass", "psutil", "async_timeout"):
+    pytest.importorskip(requirement)
+
+from cogs.utils.backends import MemoryStorage
+from cogs.utils.data import DataInteraction, chain, default_server, default_user
+from cogs.utils.db import Database
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def make_bot():
+    bot = SimpleNamespace(default_udata=default_user, default_servdata=default_server)
+    bot.db = Database(bot, MemoryStorage())
+    bot.di = DataInteraction(bot)
+    return bot
+
+
+@pytest.mark.parametrize("many, amount, expected", [("add_eco_many", 25, 125), ("set_eco_many", 7, 7)])
+def test_bulk_balance_changes(many, amount, expected):
+    bot = make_bot()
+    guild = SimpleNamespace(id=1)
+    members = [SimpleNamespace(id=user_id, guild=guild, roles=[]) for user_id in (10, 11)]
+    for member in members:
+        run(bot.db.storage.put_user(member.id, guild.id, dict(default_user, money=100)))
+
+    # Commands pass the one-shot generator from chain
+    run(getattr(bot.di, many)(chain(members), amount))
+    for member in members:
+        assert run(bot.db.get_user_data(member))["money"] == expected
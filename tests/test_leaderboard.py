@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+for requirement in ("discord", "asyncpg", "ujson", "recordclass", "psutil", "async_timeout"):
+    pytest.importorskip(requirement)
+
+from cogs.utils.backends import MemoryStorage
+from cogs.utils.data import default_user
+from cogs.utils.db import Database
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+@pytest.mark.parametrize("write_behind", [None, dict(interval=0.5, max_size=500, max_staleness=5.0)])
+def test_get_leaderboard(write_behind):
+    storage = MemoryStorage()
+    db = Database(SimpleNamespace(), storage, write_behind=write_behind)
+    guild = SimpleNamespace(id=1)
+    for user_id, money in ((10, 5), (11, 50), (12, 20)):
+        run(storage.put_user(user_id, guild.id, dict(default_user, money=money)))
+
+    assert run(db.get_leaderboard(guild, "money", 2)) == [(11, (50,)), (12, (20,))]
+    # Served from the loaded board the second time
+    assert run(db.get_leaderboard(guild, "money", 3)) == [(11, (50,)), (12, (20,)), (10, (5,))]
+
+
+def test_failed_load_is_retried():
+    storage = MemoryStorage()
+    db = Database(SimpleNamespace(), storage)
+    guild = SimpleNamespace(id=1)
+    run(storage.put_user(10, guild.id, dict(default_user, money=5)))
+
+    async def failing(guild_id, board, n):
+        raise ConnectionError()
+
+    with pytest.raises(ConnectionError):
+        run(db.leaderboards.top(failing, guild.id, "money", 1))
+    assert (guild.id, "money") not in db.leaderboards.boards
+    assert run(db.get_leaderboard(guild, "money", 1)) == [(10, (5,))]
+    assert db.leaderboards.boards[(guild.id, "money")].loaded
+
+
+@pytest.mark.parametrize("departed", [5, 120])
+def test_leaderboard_skips_departed_members(departed):
+    storage = MemoryStorage()
+    db = Database(SimpleNamespace(), storage)
+    guild = SimpleNamespace(id=1)
+    # Members who left hold the highest scores
+    for user_id in range(departed):
+        run(storage.put_user(user_id, guild.id, dict(default_user, money=10000 - user_id)))
+    present = set(range(1000, 1012))
+    for user_id in present:
+        run(storage.put_user(user_id, guild.id, dict(default_user, money=user_id)))
+
+    top = run(db.get_leaderboard(guild, "money", 10, present=lambda user_id: user_id in present))
+    assert [user_id for user_id, _ in top] == list(range(1011, 1001, -1))